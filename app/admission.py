@@ -0,0 +1,200 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+from .config import settings
+from .shared_state import SharedState, shared_state
+
+class AdmissionRejected(Exception):
+    """A request was turned away before reaching the provider."""
+    status_code = 503
+
+    def __init__(self, model: str, message: str):
+        super().__init__(f"{model}: {message}")
+        self.model = model
+
+class QueueFull(AdmissionRejected):
+    status_code = 429
+
+class DeadlineExceeded(AdmissionRejected):
+    status_code = 503
+
+class ModelGate:
+    """
+    Concurrency limit for one model. Callers over the limit wait in a priority
+    queue (higher priority first, then arrival order) until a slot frees up or
+    their deadline passes; past max_queue_depth they are rejected immediately.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue_depth: int):
+        self.name = name
+        self.limit = max(limit, 1)
+        self.max_queue_depth = max_queue_depth
+        self.active = 0
+        # (-priority, seq, future)
+        self._waiters: list = []
+        self._seq = itertools.count()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.queued_total = 0
+        self.wait_ms_total = 0.0
+        self.max_wait_ms = 0.0
+        self.fleet_waits = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    async def acquire(self, priority: int = 0, deadline: Optional[float] = None) -> float:
+        """deadline is a time.monotonic() timestamp. Returns the time spent queued (ms)."""
+        if self.active < self.limit and not self.queue_depth:
+            self.active += 1
+            self.admitted += 1
+            return 0.0
+
+        if self.queue_depth >= self.max_queue_depth:
+            self.rejected += 1
+            raise QueueFull(self.name, f"queue full ({self.max_queue_depth} waiting)")
+
+        timeout = None if deadline is None else deadline - time.monotonic()
+        if timeout is not None and timeout <= 0:
+            self.timed_out += 1
+            raise DeadlineExceeded(self.name, "deadline passed before admission")
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._seq), waiter))
+        self.queued_total += 1
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.timed_out += 1
+            raise DeadlineExceeded(self.name, f"not admitted within deadline ({timeout * 1000:.0f} ms)")
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        finally:
+            waited = (time.perf_counter() - start) * 1000
+            self.wait_ms_total += waited
+            self.max_wait_ms = max(self.max_wait_ms, waited)
+        self.admitted += 1
+        return waited
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            # Granted a slot just as we gave up on it; hand it on
+            self.release()
+        else:
+            waiter.cancel()
+
+    def release(self):
+        # The slot passes straight to the next live waiter, so active stays the same
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": (self.wait_ms_total / self.queued_total) if self.queued_total else 0.0,
+            "max_wait_ms": self.max_wait_ms,
+            "fleet_waits": self.fleet_waits
+        }
+
+class AdmissionController:
+    """
+    One ModelGate per model. With a shared state store, an admitted request also
+    takes one of the model's slots fleet-wide, so the limits hold across all
+    worker processes rather than per process.
+    """
+
+    def __init__(self, limits: Dict[str, int], max_queue_depth: int,
+                 shared: Optional[SharedState] = None, lease_seconds: float = 30.0):
+        self.gates = {name: ModelGate(name, limit, max_queue_depth) for name, limit in limits.items()}
+        self.shared = shared
+        self.lease_seconds = lease_seconds
+
+    async def _try_shared(self, gate: ModelGate) -> bool:
+        """One attempt at a fleet-wide slot. A slot the store granted is given back if the caller was cancelled meanwhile."""
+        attempt = asyncio.ensure_future(self.shared.acquire_slot(gate.name, gate.limit, self.lease_seconds))
+        try:
+            return await asyncio.shield(attempt)
+        except asyncio.CancelledError:
+            def give_back(task: asyncio.Task):
+                if not task.cancelled() and task.result():
+                    asyncio.ensure_future(self.shared.release_slot(gate.name, self.lease_seconds))
+            attempt.add_done_callback(give_back)
+            raise
+
+    async def _acquire_shared(self, gate: ModelGate, deadline: Optional[float]) -> float:
+        """Poll for a fleet-wide slot until the deadline. Returns the time spent waiting (ms)."""
+        if await self._try_shared(gate):
+            return 0.0
+        gate.fleet_waits += 1
+        start = time.perf_counter()
+        delay = 0.005
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                gate.timed_out += 1
+                raise DeadlineExceeded(gate.name, "no fleet-wide slot within deadline")
+            await asyncio.sleep(delay if remaining is None else min(delay, remaining))
+            delay = min(delay * 2, 0.1)
+            if await self._try_shared(gate):
+                return (time.perf_counter() - start) * 1000
+
+    @asynccontextmanager
+    async def slot(self, name: str, priority: int = 0, deadline: Optional[float] = None) -> AsyncIterator[float]:
+        """Holds one of the model's slots; yields the time spent queued for it (ms)."""
+        gate = self.gates[name]
+        waited = await gate.acquire(priority, deadline)
+        if self.shared is not None:
+            try:
+                waited += await self._acquire_shared(gate, deadline)
+            except BaseException:
+                gate.release()
+                raise
+        try:
+            yield waited
+        finally:
+            gate.release()
+            if self.shared is not None:
+                # Shielded so a cancelled request still returns its fleet-wide slot
+                await asyncio.shield(self.shared.release_slot(name, self.lease_seconds))
+
+    def stats(self) -> dict:
+        return {name: gate.stats() for name, gate in self.gates.items()}
+
+def admission_from_settings(model_tiers: Dict[str, str]) -> AdmissionController:
+    """One gate per model, limited by the CONCURRENCY_LIMIT_* setting of its tier."""
+    tier_limits = {
+        "simple": settings.CONCURRENCY_LIMIT_SIMPLE,
+        "moderate": settings.CONCURRENCY_LIMIT_MODERATE,
+        "complex": settings.CONCURRENCY_LIMIT_COMPLEX
+    }
+    return AdmissionController(
+        limits={model: tier_limits[tier] for model, tier in model_tiers.items()},
+        max_queue_depth=settings.ADMISSION_MAX_QUEUE_DEPTH,
+        shared=shared_state,
+        lease_seconds=settings.SHARED_STATE_LEASE_SECONDS
+    )
+
+def deadline_from_ms(deadline_ms: Optional[int]) -> float:
+    """Absolute monotonic deadline for a request budget (default ADMISSION_DEFAULT_DEADLINE_MS)."""
+    if deadline_ms is None:
+        deadline_ms = settings.ADMISSION_DEFAULT_DEADLINE_MS
+    return time.monotonic() + deadline_ms / 1000
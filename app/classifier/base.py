@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import List
 
 class BaseClassifier(ABC):
     @abstractmethod
@@ -8,3 +9,17 @@ class BaseClassifier(ABC):
         Returns: (difficulty, reasoning)
         """
         pass
+
+    async def classify_async(self, prompt: str) -> tuple[str, str]:
+        """
+        Async entry point used by the router.
+        Classifiers that call remote services override this.
+        """
+        return self.classify(prompt)
+
+    def classify_many(self, prompts: List[str]) -> List[tuple[str, str]]:
+        """Classifies a batch of prompts, in input order."""
+        return [self.classify(prompt) for prompt in prompts]
+
+    async def classify_many_async(self, prompts: List[str]) -> List[tuple[str, str]]:
+        return self.classify_many(prompts)
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from ..config import settings
+from ..shared_state import SharedState, shared_state
+
+def normalize_prompt(prompt: str) -> str:
+    """Lowercase and collapse whitespace so trivially different prompts share a key."""
+    return " ".join(prompt.lower().split())
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode()).hexdigest()
+
+class ClassificationCache:
+    """
+    In-process LRU/TTL cache of (difficulty, reasoning) keyed on the normalized prompt hash.
+    Optionally backed by a SQLite file so entries survive restarts (expired rows are
+    deleted at startup and at most every PRUNE_INTERVAL_SECONDS), and by the shared
+    state store so one worker's classifications serve the others: get_async() falls
+    back to it on a local miss, and new entries are published in batches by publish().
+    """
+    PRUNE_INTERVAL_SECONDS = 3600.0
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 86400.0, db_path: Optional[str] = None,
+                 shared: Optional[SharedState] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        # key -> (difficulty, reasoning, created_at)
+        self._entries: "OrderedDict[str, tuple[str, str, float]]" = OrderedDict()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.shared = shared
+        # Entries set since the last publish() to the shared store
+        self._unpublished: Dict[str, tuple[str, str, float]] = {}
+        self._pruned_at = 0.0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS classification_cache ("
+                "key TEXT PRIMARY KEY, difficulty TEXT, reasoning TEXT, created_at REAL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS ix_classification_cache_created_at ON classification_cache (created_at)"
+            )
+            self._prune(time.time())
+
+    def _get_memory(self, key: str, now: float) -> Optional[tuple[str, str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry[2] > self.ttl_seconds:
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return entry[0], entry[1]
+
+    async def get_async(self, prompt: str) -> Optional[tuple[str, str]]:
+        """Memory, then the SQLite tier, then the shared store."""
+        return (await self.get_many_async([prompt]))[0]
+
+    async def get_many_async(self, prompts: List[str]) -> List[Optional[tuple[str, str]]]:
+        """
+        Look up many prompts: memory first, then one SQLite read (in a worker thread)
+        and one shared store read for whatever is still missing.
+        """
+        now = time.time()
+        results: List[Optional[tuple[str, str]]] = []
+        missing: Dict[str, List[int]] = {}
+        for i, prompt in enumerate(prompts):
+            key = prompt_hash(prompt)
+            results.append(self._get_memory(key, now))
+            if results[i] is None:
+                missing.setdefault(key, []).append(i)
+
+        if missing and self._db is not None:
+            self._fill(await asyncio.to_thread(self._load_many, list(missing)), missing, results)
+        if missing and self.shared is not None:
+            self._fill(await self.shared.get_many("classification", list(missing)), missing, results)
+
+        misses = sum(len(indices) for indices in missing.values())
+        self.misses += misses
+        self.hits += len(prompts) - misses
+        return results
+
+    def _fill(self, found: Dict[str, tuple], missing: Dict[str, List[int]], results: list):
+        """Move unexpired entries found in a lower tier into memory and the results."""
+        now = time.time()
+        for key, value in found.items():
+            entry = tuple(value)
+            if now - entry[2] > self.ttl_seconds:
+                continue
+            self._remember(key, entry)
+            for i in missing.pop(key):
+                results[i] = entry[0], entry[1]
+
+    async def set(self, prompt: str, difficulty: str, reasoning: str):
+        await self.set_many([(prompt, difficulty, reasoning)])
+
+    async def set_many(self, classified: List[tuple[str, str, str]]):
+        """Store (prompt, difficulty, reasoning) results; the SQLite write runs in a worker thread."""
+        now = time.time()
+        entries = {prompt_hash(prompt): (difficulty, reasoning, now) for prompt, difficulty, reasoning in classified}
+        for key, entry in entries.items():
+            self._remember(key, entry)
+            if self.shared is not None and len(self._unpublished) < self.max_size:
+                self._unpublished[key] = entry
+        if self._db is not None and entries:
+            await asyncio.to_thread(self._store_many, entries)
+
+    async def publish(self):
+        """Write entries set since the last call to the shared store (called by the shared state sync)."""
+        if self.shared is None or not self._unpublished:
+            return
+        entries, self._unpublished = self._unpublished, {}
+        await self.shared.set_many("classification", entries, ttl=self.ttl_seconds)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "persistent": self._db is not None,
+            "shared": self.shared is not None
+        }
+
+    def _remember(self, key: str, entry: tuple[str, str, float]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _load_many(self, keys: List[str]) -> Dict[str, tuple[str, str, float]]:
+        placeholders = ",".join("?" * len(keys))
+        with self._db_lock:
+            rows = self._db.execute(
+                f"SELECT key, difficulty, reasoning, created_at FROM classification_cache WHERE key IN ({placeholders})",
+                keys
+            ).fetchall()
+        return {row[0]: tuple(row[1:]) for row in rows}
+
+    def _store_many(self, entries: Dict[str, tuple[str, str, float]]):
+        with self._db_lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO classification_cache VALUES (?, ?, ?, ?)",
+                [(key, *entry) for key, entry in entries.items()]
+            )
+        now = time.time()
+        if now - self._pruned_at > self.PRUNE_INTERVAL_SECONDS:
+            self._prune(now)
+
+    def _prune(self, now: float):
+        """Delete expired rows from the SQLite tier."""
+        self._pruned_at = now
+        with self._db_lock:
+            self._db.execute("DELETE FROM classification_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+
+# Shared across classifier instances so results survive classifier re-creation
+classification_cache = ClassificationCache(
+    max_size=settings.CLASSIFICATION_CACHE_SIZE,
+    ttl_seconds=settings.CLASSIFICATION_CACHE_TTL_SECONDS,
+    db_path=settings.CLASSIFICATION_CACHE_DB_PATH,
+    shared=shared_state
+)
@@ -0,0 +1,126 @@
+import json
+import os
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
+from ..config import settings
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "rules.json")
+
+class RuleMatch(NamedTuple):
+    difficulty: str
+    reasoning: str
+    priority: int
+    confidence: float = 1.0
+
+class RuleEngine:
+    """
+    Keyword and length rules compiled once into a single alternation regex.
+    Each prompt is classified in one linear scan; the highest-priority
+    matching rule wins and reports that rule's confidence.
+    """
+
+    def __init__(self, rules: dict):
+        default = rules.get("default", {})
+        self.default = RuleMatch(
+            default.get("difficulty", "simple"),
+            default.get("reasoning", "Short prompt with no complex keywords."),
+            0,
+            float(default.get("confidence", 1.0))
+        )
+        # Beyond this length "no keywords matched" says less about the prompt
+        self.default_confident_max_length = int(default.get("confident_max_length", 0))
+        self.default_low_confidence = float(default.get("low_confidence", self.default.confidence))
+
+        # Checked longest threshold first
+        self.length_rules = sorted(
+            (
+                (
+                    int(rule["min_length"]),
+                    rule["difficulty"],
+                    int(rule.get("priority", 0)),
+                    float(rule.get("confidence", 1.0))
+                )
+                for rule in rules.get("length_rules", [])
+            ),
+            reverse=True
+        )
+
+        # keyword -> (tier, priority, confidence); a keyword listed twice keeps its highest-priority tier
+        self.keywords: dict[str, tuple[str, int, float]] = {}
+        for rule in rules.get("keyword_rules", []):
+            priority = int(rule.get("priority", 0))
+            confidence = float(rule.get("confidence", 1.0))
+            for keyword in rule.get("keywords", []):
+                keyword = " ".join(keyword.lower().split())
+                if keyword not in self.keywords or self.keywords[keyword][1] < priority:
+                    self.keywords[keyword] = (rule["tier"], priority, confidence)
+
+        self.max_keyword_priority = max((k[1] for k in self.keywords.values()), default=0)
+        self._pattern = self._compile(self.keywords)
+
+    @staticmethod
+    def _compile(keywords: dict) -> Optional[re.Pattern]:
+        if not keywords:
+            return None
+        # Longest first so multi-word phrases win over their own prefixes
+        alternatives = [
+            r"\s+".join(re.escape(word) for word in keyword.split())
+            for keyword in sorted(keywords, key=len, reverse=True)
+        ]
+        # Whole words, allowing simple plural/verb endings ("functions", "compared")
+        return re.compile(
+            r"\b(" + "|".join(alternatives) + r")(?:s|es|d|ed|ing)?\b",
+            re.IGNORECASE
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleEngine":
+        with open(path, "r") as f:
+            return cls(json.load(f))
+
+    def match_length(self, prompt: str) -> Optional[RuleMatch]:
+        """The longest length threshold the prompt exceeds, if any."""
+        length = len(prompt)
+        for min_length, difficulty, priority, confidence in self.length_rules:
+            if length > min_length:
+                return RuleMatch(difficulty, f"Prompt length ({length} chars) exceeds {min_length}.", priority, confidence)
+        return None
+
+    def match(self, prompt: str) -> RuleMatch:
+        best = self.match_length(prompt)
+        if best is None:
+            best = self.default
+            if self.default_confident_max_length and len(prompt) > self.default_confident_max_length:
+                best = best._replace(confidence=self.default_low_confidence)
+
+        if self._pattern is not None and best.priority < self.max_keyword_priority:
+            for m in self._pattern.finditer(prompt):
+                keyword = " ".join(m.group(1).lower().split())
+                tier, priority, confidence = self.keywords[keyword]
+                if priority > best.priority:
+                    best = RuleMatch(tier, f"Contains {tier} keyword: '{keyword}'", priority, confidence)
+                    if priority >= self.max_keyword_priority:
+                        break
+
+        return best
+
+    def classify(self, prompt: str) -> tuple[str, str]:
+        match = self.match(prompt)
+        return match.difficulty, match.reasoning
+
+    def score(self, prompt: str) -> tuple[str, str, float]:
+        """Returns: (difficulty, reasoning, confidence)"""
+        match = self.match(prompt)
+        return match.difficulty, match.reasoning, match.confidence
+
+    def classify_many(self, prompts: List[str]) -> List[tuple[str, str]]:
+        return [self.classify(prompt) for prompt in prompts]
+
+@lru_cache(maxsize=None)
+def _load(path: str) -> RuleEngine:
+    return RuleEngine.from_file(path)
+
+def get_rule_engine() -> RuleEngine:
+    """Shared engine for the configured rules file, compiled on first use."""
+    return _load(settings.CLASSIFIER_RULES_PATH or DEFAULT_RULES_PATH)
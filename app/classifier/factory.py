@@ -1,23 +1,31 @@
-from typing import Dict, Type
+import importlib
+from typing import Dict, Type, Union
 from .base import BaseClassifier
 from .rules import RuleBasedClassifier
 from .llm import LLMClassifier
+from .tiered import TieredClassifier
 
 class ClassifierFactory:
-    _registry: Dict[str, Type[BaseClassifier]] = {
+    # Classes, or "module:Class" paths imported on first use (the local model pulls in numpy)
+    _registry: Dict[str, Union[Type[BaseClassifier], str]] = {
         "rules": RuleBasedClassifier,
-        "llm": LLMClassifier
+        "llm": LLMClassifier,
+        "local": "app.classifier.local:LocalModelClassifier",
+        "tiered": TieredClassifier
     }
 
     @classmethod
-    def register(cls, name: str, classifier_cls: Type[BaseClassifier]):
-        """Register a new classifier class."""
+    def register(cls, name: str, classifier_cls: Union[Type[BaseClassifier], str]):
+        """Register a new classifier class (or its "module:Class" path)."""
         cls._registry[name] = classifier_cls
 
     @classmethod
-    def get_classifier(cls, name: str) -> BaseClassifier:
-        """Get a classifier instance by name."""
+    def get_classifier(cls, name: str, **kwargs) -> BaseClassifier:
+        """Get a classifier instance by name (kwargs go to its constructor)."""
         classifier_cls = cls._registry.get(name)
         if not classifier_cls:
             raise ValueError(f"Classifier '{name}' not found. Available: {list(cls._registry.keys())}")
-        return classifier_cls()
+        if isinstance(classifier_cls, str):
+            module, _, attr = classifier_cls.partition(":")
+            classifier_cls = cls._registry[name] = getattr(importlib.import_module(module), attr)
+        return classifier_cls(**kwargs)
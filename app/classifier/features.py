@@ -0,0 +1,45 @@
+import zlib
+from typing import List, Tuple
+import numpy as np
+
+# Hashed n-gram features shared by the local classifier and its trainer.
+# crc32 keeps bucket assignment stable across processes (unlike hash()).
+
+DEFAULT_N_FEATURES = 2 ** 16
+CHAR_NGRAMS = (3, 4, 5)
+
+def _tokens(text: str) -> List[str]:
+    text = " ".join(text.lower().split())
+    words = text.split(" ")
+    tokens = ["w:" + word for word in words]
+    tokens += ["b:" + a + " " + b for a, b in zip(words, words[1:])]
+    padded = f" {text} "
+    for n in CHAR_NGRAMS:
+        tokens += ["c:" + padded[i:i + n] for i in range(len(padded) - n + 1)]
+    # Always at least one feature per prompt
+    tokens.append("len:%d" % min(len(text) // 10, 20))
+    return tokens
+
+def hash_features(text: str, n_features: int = DEFAULT_N_FEATURES) -> Tuple[np.ndarray, np.ndarray]:
+    """Sparse (indices, values) for one prompt; values are L2-normalized counts."""
+    buckets = [zlib.crc32(token.encode()) % n_features for token in _tokens(text)]
+    indices, counts = np.unique(np.asarray(buckets, dtype=np.int64), return_counts=True)
+    values = counts.astype(np.float32)
+    values /= np.linalg.norm(values)
+    return indices, values
+
+def hash_features_batch(texts: List[str], n_features: int = DEFAULT_N_FEATURES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CSR-style (indptr, indices, values) for a batch of prompts."""
+    rows = [hash_features(text, n_features) for text in texts]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(indices) for indices, _ in rows])
+    indices = np.concatenate([indices for indices, _ in rows]) if rows else np.zeros(0, dtype=np.int64)
+    values = np.concatenate([values for _, values in rows]) if rows else np.zeros(0, dtype=np.float32)
+    return indptr, indices, values
+
+def sparse_dot(indptr: np.ndarray, indices: np.ndarray, values: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """(batch x n_features) sparse matrix times (n_features x k) dense weights."""
+    if len(indptr) <= 1:
+        return np.zeros((0, weights.shape[1]), dtype=np.float32)
+    contributions = weights[indices] * values[:, None]
+    return np.add.reduceat(contributions, indptr[:-1], axis=0)
@@ -1,162 +1,222 @@
+from typing import List, Optional
 from .base import BaseClassifier
+from .cache import classification_cache
+from .engine import get_rule_engine
 from ..config import settings
+from ..llm.http_client import HTTPClientPool, http_pool
 import asyncio
 import os
-import requests
 import json
 
+DIFFICULTIES = ["simple", "moderate", "complex"]
+
+CLASSIFICATION_RULES = """Classification Rules:
+- SIMPLE: Basic facts, math, definitions, greetings (route to small model)
+- MODERATE: Code tasks, explanations, how-to questions (route to medium model)
+- COMPLEX: Deep analysis, creative writing, multi-step reasoning (route to large model)"""
+
+# Longest slice of each prompt sent in a batch classification request
+BATCH_PROMPT_CHARS = 1000
+
 class LLMClassifier(BaseClassifier):
-    def __init__(self):
+    def __init__(self, http: HTTPClientPool = None):
         # Read from settings which loads from .env
         self.openai_key = settings.OPENAI_API_KEY or os.environ.get("OPENAI_API_KEY")
         self.google_key = settings.GOOGLE_API_KEY or os.environ.get("GOOGLE_API_KEY")
+        self.http = http or http_pool
+        self.cache = classification_cache
+        self.rule_engine = get_rule_engine()
+
+    @property
+    def _use_gemini(self) -> bool:
+        return bool(self.google_key)
+
+    @property
+    def _use_openai(self) -> bool:
+        return bool(self.openai_key and self.openai_key.startswith("sk-"))
 
     async def classify_async(self, prompt: str) -> tuple[str, str]:
+        use_gemini = self._use_gemini
+        use_openai = self._use_openai
+
+        # Repeated prompts skip the remote call entirely
+        if use_gemini or use_openai:
+            cached = await self.cache.get_async(prompt)
+            if cached:
+                return cached
+
         # Try to use real LLM for classification
-        if self.google_key:
+        if use_gemini:
             return await self._classify_with_gemini(prompt)
-        elif self.openai_key and self.openai_key.startswith("sk-"):
+        elif use_openai:
             return await self._classify_with_openai(prompt)
         else:
             # Fallback to simple rules
             return self._fallback_classify(prompt)
-    
-    async def _classify_with_gemini(self, prompt: str) -> tuple[str, str]:
-        """Use Gemini to intelligently classify prompt difficulty"""
-        try:
-            from ..llm.model_discovery import ModelDiscovery
-            model = ModelDiscovery.get_cached_or_discover_gemini(self.google_key)
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={self.google_key}"
-            
-            classification_prompt = f"""Analyze this user prompt and classify its complexity for LLM routing.
+
+    async def _request_gemini(self, text: str) -> str:
+        """Send one prompt to Gemini and return the raw text of the reply."""
+        from ..llm.model_discovery import ModelDiscovery
+        # Requests don't wait for discovery still running from warm-up
+        model = await ModelDiscovery.get_gemini_model_async(self.google_key, wait=False)
+        data = {
+            "contents": [{"parts": [{"text": text}]}],
+            "generationConfig": {"temperature": 0.1}
+        }
+
+        response = await self.http.get(settings.GEMINI_API_BASE).post(
+            f"/v1beta/models/{model}:generateContent",
+            params={"key": self.google_key},
+            json=data,
+            timeout=settings.CLASSIFIER_TIMEOUT_SECONDS
+        )
+        response.raise_for_status()
+        return response.json()["candidates"][0]["content"]["parts"][0]["text"]
+
+    async def _request_openai(self, text: str, max_tokens: int = 100) -> str:
+        """Send one prompt to OpenAI and return the raw text of the reply."""
+        headers = {
+            "Authorization": f"Bearer {self.openai_key}"
+        }
+        data = {
+            "model": "gpt-3.5-turbo",
+            "messages": [{"role": "user", "content": text}],
+            "temperature": 0.1,
+            "max_tokens": max_tokens
+        }
+
+        response = await self.http.get(settings.OPENAI_API_BASE).post(
+            "/v1/chat/completions",
+            headers=headers,
+            json=data,
+            timeout=settings.CLASSIFIER_TIMEOUT_SECONDS
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    @staticmethod
+    def _parse_json(text: str):
+        # Clean markdown code blocks if present
+        text = text.strip()
+        if text.startswith("```"):
+            text = text.split("\n", 1)[1]
+            text = text.rsplit("```", 1)[0]
+        return json.loads(text.strip())
+
+    @staticmethod
+    def _parse_result(result: dict) -> tuple[str, str]:
+        difficulty = str(result.get("difficulty", "moderate")).lower()
+        reasoning = result.get("reasoning", "LLM classification")
+
+        # Validate difficulty
+        if difficulty not in DIFFICULTIES:
+            difficulty = "moderate"
+        return difficulty, reasoning
+
+    def _classification_prompt(self, prompt: str) -> str:
+        return f"""Analyze this user prompt and classify its complexity for LLM routing.
 
 User Prompt: "{prompt}"
 
-Classification Rules:
-- SIMPLE: Basic facts, math, definitions, greetings (route to small model)
-- MODERATE: Code tasks, explanations, how-to questions (route to medium model)  
-- COMPLEX: Deep analysis, creative writing, multi-step reasoning (route to large model)
+{CLASSIFICATION_RULES}
 
 Respond ONLY with valid JSON in this exact format:
 {{"difficulty": "simple|moderate|complex", "reasoning": "brief explanation"}}"""
 
-            data = {
-                "contents": [{"parts": [{"text": classification_prompt}]}],
-                "generationConfig": {"temperature": 0.1}
-            }
-            
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.post(url, headers={"Content-Type": "application/json"}, json=data)
-            )
-            
-            if response.status_code == 200:
-                res_json = response.json()
-                text = res_json["candidates"][0]["content"]["parts"][0]["text"]
-                
-                # Parse JSON response
-                # Clean markdown code blocks if present
-                text = text.strip()
-                if text.startswith("```"):
-                    text = text.split("\n", 1)[1]
-                    text = text.rsplit("```", 1)[0]
-                
-                result = json.loads(text.strip())
-                difficulty = result.get("difficulty", "moderate").lower()
-                reasoning = result.get("reasoning", "LLM classification")
-                
-                # Validate difficulty
-                if difficulty not in ["simple", "moderate", "complex"]:
-                    difficulty = "moderate"
-                
-                return difficulty, f"[Gemini Classifier] {reasoning}"
-            else:
-                return self._fallback_classify(prompt)
-                
+    async def _classify_with_gemini(self, prompt: str) -> tuple[str, str]:
+        """Use Gemini to intelligently classify prompt difficulty"""
+        try:
+            text = await self._request_gemini(self._classification_prompt(prompt))
+            difficulty, reasoning = self._parse_result(self._parse_json(text))
+            reasoning = f"[Gemini Classifier] {reasoning}"
+            await self.cache.set(prompt, difficulty, reasoning)
+            return difficulty, reasoning
+
         except Exception as e:
             print(f"Gemini classification error: {e}")
             return self._fallback_classify(prompt)
-    
+
     async def _classify_with_openai(self, prompt: str) -> tuple[str, str]:
         """Use OpenAI to intelligently classify prompt difficulty"""
         try:
-            classification_prompt = f"""Analyze this user prompt and classify its complexity for LLM routing.
+            text = await self._request_openai(self._classification_prompt(prompt))
+            difficulty, reasoning = self._parse_result(self._parse_json(text))
+            reasoning = f"[OpenAI Classifier] {reasoning}"
+            await self.cache.set(prompt, difficulty, reasoning)
+            return difficulty, reasoning
 
-User Prompt: "{prompt}"
+        except Exception as e:
+            print(f"OpenAI classification error: {e}")
+            return self._fallback_classify(prompt)
 
-Classification Rules:
-- SIMPLE: Basic facts, math, definitions, greetings (route to small model)
-- MODERATE: Code tasks, explanations, how-to questions (route to medium model)  
-- COMPLEX: Deep analysis, creative writing, multi-step reasoning (route to large model)
+    def _batch_classification_prompt(self, prompts: List[str]) -> str:
+        numbered = "\n".join(
+            f"{i + 1}. {json.dumps(prompt[:BATCH_PROMPT_CHARS])}" for i, prompt in enumerate(prompts)
+        )
+        return f"""Analyze each of these {len(prompts)} user prompts and classify its complexity for LLM routing.
 
-Respond ONLY with valid JSON in this exact format:
-{{"difficulty": "simple|moderate|complex", "reasoning": "brief explanation"}}"""
+User Prompts:
+{numbered}
 
-            headers = {
-                "Authorization": f"Bearer {self.openai_key}",
-                "Content-Type": "application/json"
-            }
-            data = {
-                "model": "gpt-3.5-turbo",
-                "messages": [{"role": "user", "content": classification_prompt}],
-                "temperature": 0.1,
-                "max_tokens": 100
-            }
-            
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=data)
-            )
-            
-            if response.status_code == 200:
-                res_json = response.json()
-                text = res_json["choices"][0]["message"]["content"]
-                
-                # Parse JSON response
-                text = text.strip()
-                if text.startswith("```"):
-                    text = text.split("\n", 1)[1]
-                    text = text.rsplit("```", 1)[0]
-                
-                result = json.loads(text.strip())
-                difficulty = result.get("difficulty", "moderate").lower()
-                reasoning = result.get("reasoning", "LLM classification")
-                
-                # Validate difficulty
-                if difficulty not in ["simple", "moderate", "complex"]:
-                    difficulty = "moderate"
-                
-                return difficulty, f"[OpenAI Classifier] {reasoning}"
+{CLASSIFICATION_RULES}
+
+Respond ONLY with a valid JSON array containing exactly {len(prompts)} objects, one per prompt, in the same order:
+[{{"difficulty": "simple|moderate|complex", "reasoning": "brief explanation"}}, ...]"""
+
+    async def _classify_chunk(self, prompts: List[str]) -> List[tuple[str, str]]:
+        """Classify a chunk of prompts with one remote call; rules on any failure."""
+        try:
+            text = self._batch_classification_prompt(prompts)
+            if self._use_gemini:
+                source, reply = "Gemini", await self._request_gemini(text)
             else:
-                return self._fallback_classify(prompt)
-                
+                # Roughly 40 output tokens per classified prompt
+                source, reply = "OpenAI", await self._request_openai(text, max_tokens=40 * len(prompts) + 20)
+
+            results = self._parse_json(reply)
+            if not isinstance(results, list) or len(results) != len(prompts):
+                raise ValueError(f"expected {len(prompts)} results, got {len(results) if isinstance(results, list) else type(results).__name__}")
+
+            classified = []
+            for prompt, result in zip(prompts, results):
+                difficulty, reasoning = self._parse_result(result if isinstance(result, dict) else {})
+                classified.append((difficulty, f"[{source} Classifier] {reasoning}"))
+            await self.cache.set_many([(prompt, *result) for prompt, result in zip(prompts, classified)])
+            return classified
+
         except Exception as e:
-            print(f"OpenAI classification error: {e}")
-            return self._fallback_classify(prompt)
-    
+            print(f"Batch classification error ({len(prompts)} prompts): {e}")
+            return self.rule_engine.classify_many(prompts)
+
+    async def classify_many_async(self, prompts: List[str]) -> List[tuple[str, str]]:
+        """
+        Classify many prompts, sending uncached ones to the LLM in chunks of BATCH_CLASSIFY_CHUNK_SIZE,
+        at most BATCH_CLASSIFY_CONCURRENCY chunks at a time.
+        """
+        if not (self._use_gemini or self._use_openai):
+            return self.rule_engine.classify_many(prompts)
+
+        results: List[Optional[tuple[str, str]]] = await self.cache.get_many_async(prompts)
+        pending = [i for i, result in enumerate(results) if result is None]
+
+        size = max(settings.BATCH_CLASSIFY_CHUNK_SIZE, 1)
+        chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+        # Bounded like batch generation, so a large batch can't flood the classifier model
+        limit = asyncio.Semaphore(max(settings.BATCH_CLASSIFY_CONCURRENCY, 1))
+
+        async def run(chunk: List[int]) -> List[tuple[str, str]]:
+            async with limit:
+                return await self._classify_chunk([prompts[i] for i in chunk])
+
+        classified = await asyncio.gather(*(run(chunk) for chunk in chunks))
+        for chunk, chunk_results in zip(chunks, classified):
+            for i, result in zip(chunk, chunk_results):
+                results[i] = result
+        return results
+
     def _fallback_classify(self, prompt: str) -> tuple[str, str]:
-        """Simple rule-based fallback when no API keys available"""
-        prompt_lower = prompt.lower()
-        
-        # Length-based
-        if len(prompt) > 500:
-            return "complex", "Long prompt (>500 chars)"
-        
-        # Keyword-based
-        complex_keywords = ["explain", "analyze", "compare", "evaluate", "discuss", "philosophy", "theory"]
-        moderate_keywords = ["write", "create", "function", "code", "how", "why", "python", "javascript"]
-        
-        for kw in complex_keywords:
-            if kw in prompt_lower:
-                return "complex", f"Contains complex keyword: '{kw}'"
-        
-        for kw in moderate_keywords:
-            if kw in prompt_lower:
-                return "moderate", f"Contains moderate keyword: '{kw}'"
-        
-        return "simple", "Short prompt with no complex keywords"
+        """Rule-based fallback when no API keys available (same rules as RuleBasedClassifier)"""
+        return self.rule_engine.classify(prompt)
 
     def classify(self, prompt: str) -> tuple[str, str]:
         """Sync wrapper"""
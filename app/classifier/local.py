@@ -0,0 +1,95 @@
+import json
+import os
+from typing import List, Optional
+import numpy as np
+from .base import BaseClassifier
+from .engine import get_rule_engine
+from .features import hash_features, hash_features_batch, sparse_dot
+from ..config import settings
+
+class LocalModelClassifier(BaseClassifier):
+    """
+    In-process linear classifier over hashed n-gram features.
+    Trained offline from request_logs (see app/classifier/train.py); no network calls.
+    Falls back to the rule engine when no model file is available.
+    """
+
+    def __init__(self, model_path: Optional[str] = None):
+        self.model_path = model_path or settings.LOCAL_CLASSIFIER_PATH
+        self.rule_engine = get_rule_engine()
+        self.weights = None # (n_features, n_labels)
+        self.bias = None
+        self.labels: List[str] = []
+        self.n_features = 0
+        self.max_chars = 0
+
+        if os.path.exists(self.model_path):
+            self.load(self.model_path)
+        else:
+            print(f"⚠ Local classifier model not found at {self.model_path}, using rule-based fallback")
+
+    def load(self, path: str):
+        with np.load(path) as model:
+            self.weights = model["weights"].astype(np.float32)
+            self.bias = model["bias"].astype(np.float32)
+            self.labels = [str(label) for label in model["labels"]]
+            meta = json.loads(str(model["meta"]))
+        self.n_features = int(meta["n_features"])
+        self.max_chars = int(meta.get("max_chars", 0))
+        print(f"✓ Local classifier loaded from {path} ({len(self.labels)} labels, {self.n_features} features)")
+
+    @property
+    def is_trained(self) -> bool:
+        return self.weights is not None
+
+    def _window(self, prompt: str) -> str:
+        # Score the same prompt window the model was trained on
+        return prompt[:self.max_chars] if self.max_chars else prompt
+
+    def _probabilities(self, scores: np.ndarray) -> np.ndarray:
+        scores = scores - scores.max(axis=-1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def predict(self, prompt: str) -> tuple[str, float]:
+        """Returns: (difficulty, confidence)"""
+        indices, values = hash_features(self._window(prompt), self.n_features)
+        probs = self._probabilities(values @ self.weights[indices] + self.bias)
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    def predict_many(self, prompts: List[str]) -> List[tuple[str, float]]:
+        indptr, indices, values = hash_features_batch([self._window(p) for p in prompts], self.n_features)
+        probs = self._probabilities(sparse_dot(indptr, indices, values, self.weights) + self.bias)
+        best = probs.argmax(axis=1)
+        return [(self.labels[i], float(probs[row, i])) for row, i in enumerate(best)]
+
+    def _length_override(self, prompt: str) -> Optional[tuple[str, str, float]]:
+        # The model only sees a prefix window, so very long prompts keep the length rules
+        match = self.rule_engine.match_length(prompt)
+        if match and match.priority > self.rule_engine.max_keyword_priority:
+            return match.difficulty, match.reasoning, match.confidence
+        return None
+
+    def score(self, prompt: str) -> tuple[str, str, float]:
+        """Returns: (difficulty, reasoning, confidence)"""
+        if not self.is_trained:
+            return self.rule_engine.score(prompt)
+        override = self._length_override(prompt)
+        if override:
+            return override
+        difficulty, confidence = self.predict(prompt)
+        return difficulty, f"[Local Classifier] {difficulty} (p={confidence:.2f})", confidence
+
+    def classify(self, prompt: str) -> tuple[str, str]:
+        difficulty, reasoning, _ = self.score(prompt)
+        return difficulty, reasoning
+
+    def classify_many(self, prompts: List[str]) -> List[tuple[str, str]]:
+        if not self.is_trained:
+            return self.rule_engine.classify_many(prompts)
+        results = []
+        for prompt, (difficulty, confidence) in zip(prompts, self.predict_many(prompts)):
+            override = self._length_override(prompt)
+            results.append(override[:2] if override else (difficulty, f"[Local Classifier] {difficulty} (p={confidence:.2f})"))
+        return results
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import time
+from typing import List
+from .base import BaseClassifier
+from .engine import get_rule_engine
+from .llm import LLMClassifier
+from ..config import settings
+
+class TieredClassifier(BaseClassifier):
+    """
+    Fast local stage first (trained local model if available, otherwise rules).
+    The remote LLM classifier is only called when the local confidence is
+    below CLASSIFIER_CONFIDENCE_THRESHOLD.
+    """
+
+    def __init__(self, remote: BaseClassifier = None, threshold: float = None):
+        self.remote = remote or LLMClassifier()
+        self.threshold = settings.CLASSIFIER_CONFIDENCE_THRESHOLD if threshold is None else threshold
+
+        if os.path.exists(settings.LOCAL_CLASSIFIER_PATH):
+            from .local import LocalModelClassifier
+            self.local = LocalModelClassifier()
+            self.local_name = "local model"
+        else:
+            self.local = get_rule_engine()
+            self.local_name = "rules"
+
+        self.local_decisions = 0
+        self.remote_decisions = 0
+        self.remote_batch_decisions = 0
+        self.remote_latency_ms_total = 0.0
+
+    async def classify_async(self, prompt: str) -> tuple[str, str]:
+        difficulty, reasoning, confidence = self.local.score(prompt)
+
+        if confidence >= self.threshold:
+            self.local_decisions += 1
+            return difficulty, f"[Tier 1: {self.local_name}, confidence {confidence:.2f}] {reasoning}"
+
+        start = time.perf_counter()
+        difficulty, reasoning = await self.remote.classify_async(prompt)
+        self.remote_latency_ms_total += (time.perf_counter() - start) * 1000
+        self.remote_decisions += 1
+        return difficulty, f"[Tier 2: LLM, tier 1 confidence {confidence:.2f}] {reasoning}"
+
+    async def classify_many_async(self, prompts: List[str]) -> List[tuple[str, str]]:
+        results = []
+        unsure = []
+        for i, prompt in enumerate(prompts):
+            difficulty, reasoning, confidence = self.local.score(prompt)
+            if confidence >= self.threshold:
+                results.append((difficulty, f"[Tier 1: {self.local_name}, confidence {confidence:.2f}] {reasoning}"))
+            else:
+                results.append(None)
+                unsure.append((i, confidence))
+        self.local_decisions += len(prompts) - len(unsure)
+
+        if unsure:
+            # Batched remote latency isn't comparable to single calls, so only the counts are tracked
+            remote = await self.remote.classify_many_async([prompts[i] for i, _ in unsure])
+            self.remote_batch_decisions += len(unsure)
+            for (i, confidence), (difficulty, reasoning) in zip(unsure, remote):
+                results[i] = (difficulty, f"[Tier 2: LLM, tier 1 confidence {confidence:.2f}] {reasoning}")
+        return results
+
+    def classify(self, prompt: str) -> tuple[str, str]:
+        """Sync wrapper"""
+        return asyncio.run(self.classify_async(prompt))
+
+    def stats(self) -> dict:
+        total = self.local_decisions + self.remote_decisions + self.remote_batch_decisions
+        avg_remote_ms = (self.remote_latency_ms_total / self.remote_decisions) if self.remote_decisions else 0.0
+        return {
+            "type": "tiered",
+            "local_stage": self.local_name,
+            "confidence_threshold": self.threshold,
+            "local_decisions": self.local_decisions,
+            "remote_decisions": self.remote_decisions + self.remote_batch_decisions,
+            "short_circuit_rate": (self.local_decisions / total) if total else 0.0,
+            "avg_remote_latency_ms": avg_remote_ms,
+            # Remote calls skipped, valued at the observed average remote latency
+            "estimated_latency_saved_ms": self.local_decisions * avg_remote_ms
+        }
@@ -0,0 +1,144 @@
+"""
+Train the local difficulty classifier from labels already stored in request_logs.
+
+    python -m app.classifier.train [--output PATH] [--sources llm,rules] [--epochs N]
+
+Only the logged `prompt_preview` is available, so the model is trained on
+(and at inference scores) the same leading window of each prompt. By default
+only LLM-labelled rows are used, so the model never learns from its own output.
+"""
+import argparse
+import json
+import os
+import sys
+import numpy as np
+from sqlalchemy import select
+from ..config import settings
+from ..database import SessionLocal, engine, migrate
+from ..metrics import classifier_source
+from ..models import RequestLog
+from .features import DEFAULT_N_FEATURES, hash_features_batch, sparse_dot
+
+PREVIEW_CHARS = 50 # Length of RequestLog.prompt_preview
+LABEL_SOURCES = ("llm", "rules", "local_model")
+
+def load_examples(sources: tuple = ("llm",)) -> tuple[list, list]:
+    """Distinct (prompt_preview, difficulty) pairs from request_logs labelled by one of `sources`."""
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(RequestLog.prompt_preview, RequestLog.difficulty, RequestLog.label_source, RequestLog.reasoning)
+        ).all()
+    finally:
+        db.close()
+
+    seen = set()
+    texts, labels = [], []
+    for prompt, difficulty, label_source, reasoning in rows:
+        if not prompt or not difficulty:
+            continue
+        # Rows logged before label_source existed: read the classifier marker from reasoning
+        if (label_source or classifier_source(reasoning)) not in sources:
+            continue
+        if (prompt, difficulty) in seen:
+            continue
+        seen.add((prompt, difficulty))
+        texts.append(prompt)
+        labels.append(difficulty)
+    return texts, labels
+
+def train(texts: list, labels: list, n_features: int = DEFAULT_N_FEATURES,
+          epochs: int = 300, learning_rate: float = 0.1, l2: float = 1e-4) -> dict:
+    """Full-batch softmax regression (Adam) over hashed features."""
+    label_names = sorted(set(labels))
+    y = np.array([label_names.index(label) for label in labels])
+    targets = np.eye(len(label_names), dtype=np.float32)[y]
+    indptr, indices, values = hash_features_batch(texts, n_features)
+    rows = np.repeat(np.arange(len(texts)), np.diff(indptr))
+
+    weights = np.zeros((n_features, len(label_names)), dtype=np.float32)
+    bias = np.zeros(len(label_names), dtype=np.float32)
+    m_w, v_w = np.zeros_like(weights), np.zeros_like(weights)
+    m_b, v_b = np.zeros_like(bias), np.zeros_like(bias)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+    for step in range(1, epochs + 1):
+        scores = sparse_dot(indptr, indices, values, weights) + bias
+        scores -= scores.max(axis=1, keepdims=True)
+        probs = np.exp(scores)
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        error = (probs - targets) / len(texts)
+        grad_w = l2 * weights
+        for k in range(len(label_names)):
+            grad_w[:, k] += np.bincount(indices, weights=values * error[rows, k], minlength=n_features)
+        grad_b = error.sum(axis=0)
+
+        m_w = beta1 * m_w + (1 - beta1) * grad_w
+        v_w = beta2 * v_w + (1 - beta2) * grad_w ** 2
+        m_b = beta1 * m_b + (1 - beta1) * grad_b
+        v_b = beta2 * v_b + (1 - beta2) * grad_b ** 2
+        correction = np.sqrt(1 - beta2 ** step) / (1 - beta1 ** step)
+        weights -= learning_rate * correction * m_w / (np.sqrt(v_w) + eps)
+        bias -= learning_rate * correction * m_b / (np.sqrt(v_b) + eps)
+
+    return {"weights": weights, "bias": bias, "labels": label_names, "n_features": n_features}
+
+def accuracy(model: dict, texts: list, labels: list) -> float:
+    if not texts:
+        return 0.0
+    indptr, indices, values = hash_features_batch(texts, model["n_features"])
+    scores = sparse_dot(indptr, indices, values, model["weights"]) + model["bias"]
+    predicted = [model["labels"][i] for i in scores.argmax(axis=1)]
+    return float(np.mean([p == label for p, label in zip(predicted, labels)]))
+
+def save(model: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    meta = {"n_features": model["n_features"], "max_chars": PREVIEW_CHARS}
+    np.savez_compressed(
+        path,
+        weights=model["weights"].astype(np.float16),
+        bias=model["bias"],
+        labels=np.array(model["labels"]),
+        meta=np.array(json.dumps(meta))
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local difficulty classifier from request_logs")
+    parser.add_argument("--output", default=settings.LOCAL_CLASSIFIER_PATH)
+    parser.add_argument("--sources", default="llm",
+                        help=f"Comma-separated label sources to learn from ({', '.join(LABEL_SOURCES)}); "
+                             "local_model retrains the model on its own predictions")
+    parser.add_argument("--epochs", type=int, default=300)
+    parser.add_argument("--n-features", type=int, default=DEFAULT_N_FEATURES)
+    parser.add_argument("--holdout", type=float, default=0.1, help="Fraction of examples held out for evaluation")
+    args = parser.parse_args()
+
+    sources = tuple(source.strip() for source in args.sources.split(",") if source.strip())
+    unknown = sorted(set(sources) - set(LABEL_SOURCES))
+    if unknown:
+        parser.error(f"unknown label sources: {', '.join(unknown)}")
+    # Logs written before label_source existed need the column added
+    with engine.begin() as conn:
+        migrate(conn)
+    texts, labels = load_examples(sources)
+    if len(set(labels)) < 2:
+        print(f"Need examples of at least two difficulties, found {len(texts)} rows with {sorted(set(labels))}.")
+        sys.exit(1)
+
+    order = np.random.default_rng(0).permutation(len(texts))
+    split = int(len(texts) * (1 - args.holdout))
+    train_idx, test_idx = order[:split], order[split:]
+
+    model = train([texts[i] for i in train_idx], [labels[i] for i in train_idx],
+                  n_features=args.n_features, epochs=args.epochs)
+    print(f"Trained on {len(train_idx)} examples ({', '.join(model['labels'])})")
+    print(f"Train accuracy: {accuracy(model, [texts[i] for i in train_idx], [labels[i] for i in train_idx]):.3f}")
+    if len(test_idx):
+        print(f"Holdout accuracy: {accuracy(model, [texts[i] for i in test_idx], [labels[i] for i in test_idx]):.3f}")
+
+    save(model, args.output)
+    print(f"✓ Saved model to {args.output} ({os.path.getsize(args.output) / 1024:.0f} KiB)")
+
+if __name__ == "__main__":
+    main()
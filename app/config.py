@@ -1,15 +1,134 @@
+import os
+from dotenv import dotenv_values
 from pydantic_settings import BaseSettings
 
 from typing import Optional
 
 class Settings(BaseSettings):
-    CLASSIFIER_TYPE: str = "rules" # "rules" or "llm"
+    CLASSIFIER_TYPE: str = "rules" # "rules", "llm", "local" or "tiered"
+    CLASSIFIER_CONFIDENCE_THRESHOLD: float = 0.8 # Tiered: call the LLM only below this local confidence
+    CLASSIFIER_RULES_PATH: Optional[str] = None # Defaults to app/classifier/rules.json
+    LOCAL_CLASSIFIER_PATH: str = "./models/difficulty_classifier.npz"
     DATABASE_URL: str = "sqlite:///./sql_app.db"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+
+    # SQLite storage profile (applied to every new connection)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_CACHE_SIZE: int = -64000 # Negative = KiB, i.e. ~64 MB page cache
+    SQLITE_MMAP_SIZE: int = 268435456 # 256 MB
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
     OPENAI_API_KEY: Optional[str] = None
     GOOGLE_API_KEY: Optional[str] = None
+
+    # Provider endpoints
+    GEMINI_API_BASE: str = "https://generativelanguage.googleapis.com"
+    OPENAI_API_BASE: str = "https://api.openai.com"
+
+    # Shared HTTP connection pool (per provider host)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+    HTTP_READ_TIMEOUT: float = 60.0
+
+    # Model discovery cache (per API key)
+    DISCOVERY_TTL_SECONDS: float = 3600.0
+    DISCOVERY_REFRESH_AHEAD_SECONDS: float = 300.0
+    DISCOVERY_RETRY_SECONDS: float = 60.0
+
+    # Classification result cache
+    CLASSIFICATION_CACHE_SIZE: int = 10000
+    CLASSIFICATION_CACHE_TTL_SECONDS: float = 86400.0
+    CLASSIFICATION_CACHE_DB_PATH: Optional[str] = None # e.g. "./classification_cache.db" to survive restarts
+
+    # Background request log writer
+    LOG_QUEUE_MAX_SIZE: int = 10000
+    LOG_BATCH_SIZE: int = 500
+    LOG_FLUSH_INTERVAL_SECONDS: float = 0.5
+
+    # Provider resilience: per-call timeout, retries, circuit breaker, optional hedged requests
+    PROVIDER_TIMEOUT_SECONDS: float = 30.0
+    PROVIDER_MAX_RETRIES: int = 2
+    PROVIDER_RETRY_BACKOFF_SECONDS: float = 0.2 # Base for jittered exponential backoff
+    CIRCUIT_FAILURE_THRESHOLD: int = 5 # Consecutive failures before a provider's circuit opens
+    CIRCUIT_RESET_SECONDS: float = 30.0
+    HEDGE_REQUESTS: bool = False # Send a second attempt once a call outlasts the model's p95
+    HEDGE_MIN_DELAY_MS: float = 50.0
+    CLASSIFIER_TIMEOUT_SECONDS: float = 10.0
+    PROVIDER_DRAIN_SECONDS: float = 120.0 # After an API key change, how long old clients may finish requests
+
+    # Routing policy: "static" (fixed model per tier) or "latency" (move off models breaching their SLO)
+    ROUTING_POLICY: str = "static"
+    ROUTING_SLO_MS_SIMPLE: float = 1000.0 # p95 generation latency SLO per tier
+    ROUTING_SLO_MS_MODERATE: float = 2000.0
+    ROUTING_SLO_MS_COMPLEX: float = 5000.0
+    ROUTING_MAX_ERROR_RATE: float = 0.5
+    ROUTING_MAX_COST_MULTIPLIER: float = 2.0 # Pricier-tier alternates may cost at most this x the primary
+    ROUTING_MIN_SAMPLES: int = 20 # Recent samples needed before a model can be judged
+    MODEL_STATS_EWMA_ALPHA: float = 0.2
+    MODEL_STATS_WINDOW: int = 200 # Latencies kept per model for percentiles
+    MODEL_STATS_WINDOW_SECONDS: float = 60.0
+    STAGE_TIMINGS_WINDOW: int = 1000 # Recent requests per model kept for stage percentiles
+
+    # Admission control: max concurrent provider calls per tier, queue depth and wait budget
+    CONCURRENCY_LIMIT_SIMPLE: int = 32
+    CONCURRENCY_LIMIT_MODERATE: int = 16
+    CONCURRENCY_LIMIT_COMPLEX: int = 8
+    ADMISSION_MAX_QUEUE_DEPTH: int = 100 # Waiting requests per model before rejecting with 429
+    ADMISSION_DEFAULT_DEADLINE_MS: int = 30000 # Max wait for a slot before rejecting with 503
+
+    # State shared between worker processes: "memory" (none), "sqlite" or "redis"
+    SHARED_STATE_BACKEND: str = "memory"
+    SHARED_STATE_PATH: str = "./shared_state.db"
+    SHARED_STATE_REDIS_URL: str = "redis://localhost:6379/0"
+    SHARED_STATE_SYNC_SECONDS: float = 2.0 # How often per-model stats and cache entries are exchanged
+    SHARED_STATE_LEASE_SECONDS: float = 30.0 # A crashed worker's admission slots are reclaimed after this
+
+    # Concurrent identical prompts share one classification and generation
+    REQUEST_COALESCING: bool = True
+
+    # Semantic response cache in front of routing (cosine similarity over hashed n-grams)
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_MAX_SIZE: int = 2000
+    RESPONSE_CACHE_TTL_SECONDS: float = 3600.0
+    RESPONSE_CACHE_DIMENSIONS: int = 2048
+    # Minimum similarity to reuse an answer, by the cached answer's difficulty
+    RESPONSE_CACHE_THRESHOLD_SIMPLE: float = 0.9
+    RESPONSE_CACHE_THRESHOLD_MODERATE: float = 0.95
+    RESPONSE_CACHE_THRESHOLD_COMPLEX: float = 0.98
+
+    # Speculative execution: start SPECULATIVE_TIER's model while classification runs
+    SPECULATIVE_EXECUTION: bool = False
+    SPECULATIVE_TIER: str = "simple"
+
+    # Batch routing (/route/batch)
+    BATCH_MAX_ITEMS: int = 1000
+    BATCH_CLASSIFY_CHUNK_SIZE: int = 20 # Prompts per remote classification call
+    BATCH_CONCURRENCY_PER_MODEL: int = 8
+    BATCH_CLASSIFY_CONCURRENCY: int = 4 # Classification chunks in flight at once
+
+    # GET /logs page sizes
+    LOGS_MAX_PAGE_SIZE: int = 1000 # JSON responses
+    LOGS_MAX_EXPORT_ROWS: int = 1000000 # format=ndjson (streamed)
     
     class Config:
         env_file = ".env"
         extra = "ignore"
 
 settings = Settings()
+
+API_KEY_NAMES = ("OPENAI_API_KEY", "GOOGLE_API_KEY")
+
+def apply_api_keys(keys: dict):
+    """Use new API keys in this process (settings and os.environ); empty values are skipped."""
+    for name in API_KEY_NAMES:
+        if keys.get(name):
+            os.environ[name] = keys[name]
+            setattr(settings, name, keys[name])
+
+def reload_api_keys(env_path: str = ".env"):
+    """Pick up API keys another worker wrote to the .env file."""
+    if os.path.exists(env_path):
+        apply_api_keys(dotenv_values(env_path))
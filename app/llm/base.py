@@ -1,10 +1,43 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
+
+class ProviderError(Exception):
+    """
+    A provider call failed; retryable is False for errors a retry cannot fix (bad request, auth).
+    code is a short label for metrics: the HTTP status, or e.g. "transport", "timeout".
+    """
+
+    def __init__(self, provider: str, message: str, retryable: bool = True, code: str = "error"):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        self.message = message
+        self.retryable = retryable
+        self.code = code
 
 class LLMClient(ABC):
+    # Clients with setup work (e.g. model discovery) set this and do it in warm_up()
+    needs_warm_up = False
+    # Static list price (USD per 1K tokens), used for cost comparisons before any cost is observed
+    cost_per_1k_tokens: Optional[float] = None
+
+    async def warm_up(self):
+        """Prepare the client before it takes traffic; called in the background at startup."""
+        pass
+
     @abstractmethod
     async def generate(self, prompt: str, max_tokens: int = 100) -> tuple[str, float, int]:
         """
         Generates text from the model.
         Returns: (response_text, cost_usd, tokens_used)
+        Raises: ProviderError when the provider call fails
         """
         pass
+
+    async def generate_stream(self, prompt: str, max_tokens: int = 100) -> AsyncIterator[tuple[str, float, int]]:
+        """
+        Streams text from the model as it is produced.
+        Yields: (text_chunk, cost_usd_so_far, tokens_so_far); the last item carries the final totals.
+        Clients without native streaming send the whole response as one chunk.
+        """
+        text, cost, tokens = await self.generate(prompt, max_tokens)
+        yield text, cost, tokens
@@ -1,74 +1,198 @@
-import requests
-import os
-from typing import Optional
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from ..config import settings
+from ..shared_state import WORKER_ID, shared_state
+
+FALLBACK_GEMINI_MODEL = "gemini-2.5-flash"
+# How long one worker may hold the right to call the listing API for everyone
+DISCOVERY_LEASE_SECONDS = 10.0
+
+@dataclass
+class _DiscoveryEntry:
+    model: str
+    refresh_at: float # Start a background refresh after this point
+    expires_at: float # Block on a refresh after this point (kept ahead of retries, see _store)
 
 class ModelDiscovery:
     """Automatically discover available models from API providers"""
-    
+
+    # Discovery results per API key (keyed by a hash, never the raw key)
+    _cache: Dict[str, _DiscoveryEntry] = {}
+    # In-flight refreshes per API key, so concurrent callers share one listing call
+    _inflight: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _cache_key(api_key: str) -> str:
+        return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
     @staticmethod
-    def get_best_gemini_model(api_key: str) -> Optional[str]:
+    def _select_gemini_model(models: List[dict]) -> Optional[str]:
         """
-        Query Google API to find the best available Gemini model.
+        Pick the best Gemini model from a `/v1beta/models` listing.
         Preference: flash models (fast & cheap) > pro models
         """
+        # Filter for Gemini models that support generateContent
+        gemini_models = []
+        for model in models:
+            name = model.get('name', '')
+            methods = model.get('supportedGenerationMethods', [])
+
+            if 'gemini' in name.lower() and 'generateContent' in methods:
+                gemini_models.append(name)
+
+        # Preference order: flash > pro, newer versions first
+        # Priority: 2.5-flash > 2.0-flash > flash-latest > 2.5-pro > pro-latest
+        priority_patterns = [
+            'gemini-2.5-flash',
+            'gemini-2.0-flash',
+            'gemini-flash-latest',
+            'gemini-2.5-pro',
+            'gemini-2.0-pro',
+            'gemini-pro-latest'
+        ]
+
+        for pattern in priority_patterns:
+            for model in gemini_models:
+                if pattern in model:
+                    return model.replace('models/', '')
+
+        # Fallback: return first available
+        if gemini_models:
+            return gemini_models[0].replace('models/', '')
+
+        return None
+
+    @staticmethod
+    async def get_best_gemini_model_async(api_key: str) -> Optional[str]:
+        """
+        Query the Google API through the shared HTTP pool for the best available Gemini model.
+        Preference: flash models (fast & cheap) > pro models
+        """
+        from .http_client import http_pool
         try:
-            url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
-            response = requests.get(url, timeout=5)
-            
+            response = await http_pool.get(settings.GEMINI_API_BASE).get(
+                "/v1beta/models",
+                params={"key": api_key},
+                timeout=5
+            )
+
             if response.status_code != 200:
                 return None
-            
-            models = response.json().get('models', [])
-            
-            # Filter for Gemini models that support generateContent
-            gemini_models = []
-            for model in models:
-                name = model.get('name', '')
-                methods = model.get('supportedGenerationMethods', [])
-                
-                if 'gemini' in name.lower() and 'generateContent' in methods:
-                    gemini_models.append(name)
-            
-            # Preference order: flash > pro, newer versions first
-            # Priority: 2.5-flash > 2.0-flash > flash-latest > 2.5-pro > pro-latest
-            priority_patterns = [
-                'gemini-2.5-flash',
-                'gemini-2.0-flash',
-                'gemini-flash-latest',
-                'gemini-2.5-pro',
-                'gemini-2.0-pro',
-                'gemini-pro-latest'
-            ]
-            
-            for pattern in priority_patterns:
-                for model in gemini_models:
-                    if pattern in model:
-                        return model.replace('models/', '')
-            
-            # Fallback: return first available
-            if gemini_models:
-                return gemini_models[0].replace('models/', '')
-            
-            return None
-            
+
+            return ModelDiscovery._select_gemini_model(response.json().get('models', []))
+
         except Exception as e:
             print(f"Model discovery error: {e}")
             return None
-    
-    @staticmethod
-    def get_cached_or_discover_gemini(api_key: str) -> str:
-        """
-        Get Gemini model with caching to avoid repeated API calls.
-        Falls back to hardcoded model if discovery fails.
-        """
-        # Try to discover
-        discovered = ModelDiscovery.get_best_gemini_model(api_key)
-        
+
+    @classmethod
+    def _store(cls, key: str, discovered: Optional[str]) -> str:
+        """Record a discovery result; on failure keep serving the stale model."""
+        now = time.monotonic()
+        entry = cls._cache.get(key)
+
         if discovered:
-            print(f"✓ Auto-discovered Gemini model: {discovered}")
+            if not entry or entry.model != discovered:
+                print(f"✓ Auto-discovered Gemini model: {discovered}")
+            ttl = settings.DISCOVERY_TTL_SECONDS
+            cls._cache[key] = _DiscoveryEntry(
+                model=discovered,
+                refresh_at=now + max(ttl - settings.DISCOVERY_REFRESH_AHEAD_SECONDS, 0),
+                expires_at=now + ttl
+            )
             return discovered
-        
+
+        # Retry in the background after a short delay instead of on every call. Expiry stays
+        # past the retry, so callers keep getting the stale model rather than blocking on it.
+        retry_at = now + settings.DISCOVERY_RETRY_SECONDS
+        expires_at = retry_at + settings.DISCOVERY_REFRESH_AHEAD_SECONDS
+        if entry:
+            print(f"⚠ Model discovery refresh failed, serving cached model: {entry.model}")
+            entry.refresh_at = retry_at
+            entry.expires_at = max(entry.expires_at, expires_at)
+            return entry.model
+
         # Fallback to known working model
-        fallback = "gemini-2.5-flash"
-        print(f"⚠ Model discovery failed, using fallback: {fallback}")
-        return fallback
+        print(f"⚠ Model discovery failed, using fallback: {FALLBACK_GEMINI_MODEL}")
+        cls._cache[key] = _DiscoveryEntry(FALLBACK_GEMINI_MODEL, retry_at, expires_at)
+        return FALLBACK_GEMINI_MODEL
+
+    @staticmethod
+    async def _shared_model(key: str) -> Optional[str]:
+        entry = await shared_state.get("discovery", key)
+        return entry["model"] if entry else None
+
+    @staticmethod
+    async def _publish(key: str, model: str):
+        # Expires when a refresh is due, so the fleet refreshes once rather than re-reading a stale answer
+        ttl = max(settings.DISCOVERY_TTL_SECONDS - settings.DISCOVERY_REFRESH_AHEAD_SECONDS, 1.0)
+        await shared_state.set("discovery", key, {"model": model, "worker": WORKER_ID}, ttl=ttl)
+
+    @classmethod
+    async def _discover_shared(cls, key: str, api_key: str) -> Optional[str]:
+        """
+        Reuse another worker's recent discovery if there is one. Otherwise the worker
+        holding the lease calls the listing API and publishes the result; the rest
+        wait for it instead of making their own call.
+        """
+        if not shared_state:
+            return await cls.get_best_gemini_model_async(api_key)
+        model = await cls._shared_model(key)
+        if model:
+            return model
+        if await shared_state.add("discovery_lease", key, WORKER_ID, ttl=DISCOVERY_LEASE_SECONDS):
+            model = await cls.get_best_gemini_model_async(api_key)
+            if model:
+                await cls._publish(key, model)
+            return model
+
+        deadline = time.monotonic() + DISCOVERY_LEASE_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+            model = await cls._shared_model(key)
+            if model:
+                return model
+        # The lease holder never published (e.g. it failed); ask directly
+        return await cls.get_best_gemini_model_async(api_key)
+
+    @classmethod
+    def _refresh(cls, key: str, api_key: str) -> asyncio.Task:
+        """Start a refresh for this key, or join the one already in flight."""
+        task = cls._inflight.get(key)
+        if task is None or task.done():
+            async def run() -> str:
+                try:
+                    return cls._store(key, await cls._discover_shared(key, api_key))
+                finally:
+                    cls._inflight.pop(key, None)
+            task = asyncio.ensure_future(run())
+            cls._inflight[key] = task
+        return task
+
+    @classmethod
+    async def get_gemini_model_async(cls, api_key: str, wait: bool = True) -> str:
+        """
+        Get the Gemini model for this API key from the TTL cache.
+        Refreshes in the background shortly before expiry; only one listing
+        call is made per key no matter how many requests arrive at once.
+        With wait=False a request never waits on discovery: before the first
+        result (or after expiry) it gets the cached or fallback model instead.
+        """
+        key = cls._cache_key(api_key)
+        entry = cls._cache.get(key)
+        now = time.monotonic()
+
+        if entry and now < entry.refresh_at:
+            return entry.model
+
+        task = cls._refresh(key, api_key)
+        if entry and (now < entry.expires_at or not wait):
+            # Still valid: serve it and let the refresh finish on its own
+            return entry.model
+        if not wait:
+            return FALLBACK_GEMINI_MODEL
+
+        return await asyncio.shield(task)
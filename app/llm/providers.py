@@ -1,15 +1,51 @@
 import asyncio
+import json
 import random
 import os
-import asyncio
-import os
-import requests
-from .base import LLMClient
+from abc import abstractmethod
+from typing import AsyncIterator
+import httpx
+from .base import LLMClient, ProviderError
+from .http_client import HTTPClientPool, http_pool
+
+async def simulate_stream(text: str, cost: float, tokens: int, latency: float,
+                          first_token_fraction: float = 0.4) -> AsyncIterator[tuple[str, float, int]]:
+    """Replay a simulated response word by word over the same total latency."""
+    words = text.split(" ")
+    await asyncio.sleep(latency * first_token_fraction)
+    per_word = latency * (1 - first_token_fraction) / max(len(words) - 1, 1)
+    for i, word in enumerate(words):
+        if i:
+            await asyncio.sleep(per_word)
+        done = (i + 1) / len(words)
+        yield (word if i == 0 else " " + word), cost * done, int(tokens * done)
+
+def is_retryable_status(status_code: int) -> bool:
+    """Rate limits and server errors are worth retrying; other client errors are not."""
+    return status_code == 429 or status_code >= 500
+
+class SimulatedClient(LLMClient):
+    """Demo client with a fixed simulated latency"""
+    latency = 0.1
+
+    @abstractmethod
+    def _respond(self, prompt: str) -> tuple[str, float, int]:
+        """Returns the canned (text, cost, tokens) for a prompt."""
+        pass
 
-class Phi3Client(LLMClient):
     async def generate(self, prompt: str, max_tokens: int = 100) -> tuple[str, float, int]:
-        await asyncio.sleep(0.1) # Simulate latency
-        
+        await asyncio.sleep(self.latency) # Simulate latency
+        return self._respond(prompt)
+
+    async def generate_stream(self, prompt: str, max_tokens: int = 100) -> AsyncIterator[tuple[str, float, int]]:
+        async for chunk in simulate_stream(*self._respond(prompt), self.latency):
+            yield chunk
+
+class Phi3Client(SimulatedClient):
+    latency = 0.1
+    cost_per_1k_tokens = 0.0018 # About $0.000046 for a typical ~25-token reply
+
+    def _respond(self, prompt: str) -> tuple[str, float, int]:
         # Simple mock logic for demo
         if "2*2" in prompt or "2+2" in prompt:
             response = "The answer is 4."
@@ -19,70 +55,142 @@ class Phi3Client(LLMClient):
         return response, 0.000046, len(prompt.split()) + 20
 
 class GeminiClient(LLMClient):
-    def __init__(self):
-        from .model_discovery import ModelDiscovery
+    cost_per_1k_tokens = 0.0005 # Flash is very cheap
+
+    def __init__(self, http: HTTPClientPool = None):
         from ..config import settings
         
         # Read from settings (which loads from .env) or os.environ
         self.api_key = settings.GOOGLE_API_KEY or os.environ.get("GOOGLE_API_KEY")
+        self.base_url = settings.GEMINI_API_BASE
+        self.http = http or http_pool
+        # Discovered in warm_up(); until then generate() uses the simulated fallback
         self.model = None
-        
-        # Auto-discover best available model
+    
+    @property
+    def needs_warm_up(self) -> bool:
+        return bool(self.api_key)
+    
+    async def warm_up(self):
+        """Auto-discover the best available model without blocking startup."""
+        from .model_discovery import ModelDiscovery
         if self.api_key:
-            self.model = ModelDiscovery.get_cached_or_discover_gemini(self.api_key)
+            self.model = await ModelDiscovery.get_gemini_model_async(self.api_key)
             print(f"✓ GeminiClient initialized with model: {self.model}")
     
     async def generate(self, prompt: str, max_tokens: int = 100) -> tuple[str, float, int]:
         api_key = self.api_key
         
         if api_key and self.model:
+            data = {
+                "contents": [{"parts": [{"text": prompt}]}]
+            }
+            
             try:
-                url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent?key={api_key}"
-                headers = {"Content-Type": "application/json"}
-                data = {
-                    "contents": [{"parts": [{"text": prompt}]}]
-                }
-                
-                loop = asyncio.get_event_loop()
-                response = await loop.run_in_executor(
-                    None, 
-                    lambda: requests.post(url, headers=headers, json=data)
+                response = await self.http.get(self.base_url).post(
+                    f"/v1beta/models/{self.model}:generateContent",
+                    params={"key": api_key},
+                    json=data
                 )
-                
-                if response.status_code == 200:
-                    res_json = response.json()
-                    try:
-                        text = res_json["candidates"][0]["content"]["parts"][0]["text"]
-                        # Estimate tokens (Gemini doesn't always return usage in simple response, or structure varies)
-                        # But usually it's in usageMetadata if requested. For now, simple estimate.
-                        tokens = len(text.split()) * 1.3 
-                        cost = (tokens / 1000) * 0.0005 # Flash is very cheap
-                        return f"[Gemini 2.5 Flash] {text}", cost, int(tokens)
-                    except (KeyError, IndexError):
-                         return f"[Error] Gemini response parsing failed: {response.text}", 0.0, 0
-                else:
-                    return f"[Error] Gemini API failed: {response.text}", 0.0, 0
-            except Exception as e:
-                return f"[Error] Exception calling Gemini: {str(e)}", 0.0, 0
+            except httpx.HTTPError as e:
+                raise ProviderError("Gemini", f"request failed: {type(e).__name__}: {e}", code="transport")
+            
+            if response.status_code != 200:
+                raise ProviderError("Gemini", f"API returned {response.status_code}: {response.text[:200]}",
+                                    retryable=is_retryable_status(response.status_code),
+                                    code=str(response.status_code))
+            
+            try:
+                text = response.json()["candidates"][0]["content"]["parts"][0]["text"]
+            except (ValueError, KeyError, IndexError):
+                raise ProviderError("Gemini", f"response parsing failed: {response.text[:200]}", retryable=False,
+                                    code="parse")
+            # Estimate tokens (Gemini doesn't always return usage in simple response, or structure varies)
+            # But usually it's in usageMetadata if requested. For now, simple estimate.
+            tokens = len(text.split()) * 1.3 
+            cost = self._estimate_cost(tokens)
+            return f"[Gemini 2.5 Flash] {text}", cost, int(tokens)
 
         # Fallback to Llama 3 Simulation
         await asyncio.sleep(0.3)
+        return self._simulated_response(prompt)
+
+    def _simulated_response(self, prompt: str) -> tuple[str, float, int]:
         response = f"[Llama-3 (Simulated)] Processed moderate request: {prompt[:20]}..."
         return response, 0.00029, len(prompt.split()) + 50
 
-class Llama3Client(LLMClient):
+    @staticmethod
+    def _estimate_cost(tokens: float) -> float:
+        return (tokens / 1000) * GeminiClient.cost_per_1k_tokens
+
+    async def generate_stream(self, prompt: str, max_tokens: int = 100) -> AsyncIterator[tuple[str, float, int]]:
+        api_key = self.api_key
+
+        if not (api_key and self.model):
+            async for chunk in simulate_stream(*self._simulated_response(prompt), 0.3):
+                yield chunk
+            return
+
+        data = {
+            "contents": [{"parts": [{"text": prompt}]}]
+        }
+        prefix = "[Gemini 2.5 Flash] "
+        text = ""
+        tokens = 0
+        try:
+            async with self.http.get(self.base_url).stream(
+                "POST",
+                f"/v1beta/models/{self.model}:streamGenerateContent",
+                params={"key": api_key, "alt": "sse"},
+                json=data
+            ) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode(errors="replace")
+                    raise ProviderError("Gemini", f"API returned {response.status_code}: {body[:200]}",
+                                        retryable=is_retryable_status(response.status_code),
+                                        code=str(response.status_code))
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[5:])
+                    chunk = "".join(
+                        part.get("text", "")
+                        for candidate in event.get("candidates", [])[:1]
+                        for part in candidate.get("content", {}).get("parts", [])
+                    )
+                    text += chunk
+                    # Prefer reported usage; otherwise estimate like generate()
+                    usage = event.get("usageMetadata", {})
+                    tokens = usage.get("candidatesTokenCount") or int(len(text.split()) * 1.3)
+                    if chunk:
+                        yield prefix + chunk, self._estimate_cost(tokens), tokens
+                        prefix = ""
+        except httpx.HTTPError as e:
+            raise ProviderError("Gemini", f"stream failed: {type(e).__name__}: {e}", code="transport")
+        except (ValueError, KeyError) as e:
+            raise ProviderError("Gemini", f"stream parsing failed: {e}", retryable=False, code="parse")
+
+        # Final totals (usage usually arrives with the last event)
+        yield "", self._estimate_cost(tokens), tokens
+
+class Llama3Client(SimulatedClient):
     # Kept for backward compatibility or specific use
-    async def generate(self, prompt: str, max_tokens: int = 100) -> tuple[str, float, int]:
-        # Simulate medium latency and cost
-        await asyncio.sleep(0.3)
+    # Simulate medium latency and cost
+    latency = 0.3
+    cost_per_1k_tokens = 0.0053 # About $0.00029 for a typical ~55-token reply
+
+    def _respond(self, prompt: str) -> tuple[str, float, int]:
         response = f"[Llama-3] Processed moderate request: {prompt[:20]}..."
         return response, 0.00029, len(prompt.split()) + 50
 
-class GPT4oClient(LLMClient):
-    async def generate(self, prompt: str, max_tokens: int = 100) -> tuple[str, float, int]:
-        # Simulate high latency and high cost (or call actual API if key provided)
-        # For this demo, we simulate.
-        await asyncio.sleep(0.8)
+class GPT4oClient(SimulatedClient):
+    # Simulate high latency and high cost (or call actual API if key provided)
+    # For this demo, we simulate.
+    latency = 0.8
+    cost_per_1k_tokens = 0.03 # Hypothetical expensive cost
+
+    def _respond(self, prompt: str) -> tuple[str, float, int]:
         tokens = len(prompt.split()) + 100
-        cost = tokens * 0.00003 # Hypothetical expensive cost
+        cost = (tokens / 1000) * self.cost_per_1k_tokens
         return f"[GPT-4o] Processed complex request: {prompt[:30]}...", cost, tokens
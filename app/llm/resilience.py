@@ -0,0 +1,215 @@
+import asyncio
+import random
+import time
+from typing import AsyncIterator, Callable, Optional
+from .base import LLMClient, ProviderError
+from ..metrics import PROVIDER_ERRORS
+
+class CircuitOpenError(ProviderError):
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(provider, f"circuit open, retrying in {retry_in:.1f}s", retryable=False,
+                         code="circuit_open")
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures and rejects calls for
+    reset_seconds. Then a single trial call is let through (half-open): success
+    closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self, provider: str):
+        """Raises CircuitOpenError when the call should not be attempted."""
+        state = self.state
+        if state == "open" or (state == "half_open" and self.trial_in_flight):
+            raise CircuitOpenError(provider, max(self.reset_seconds - (time.monotonic() - self.opened_at), 0))
+        if state == "half_open":
+            self.trial_in_flight = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.trial_in_flight or (self.opened_at is None and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+        self.trial_in_flight = False
+
+    def release_trial(self):
+        # A trial call that ended without a verdict (e.g. cancelled) frees the slot for the next one
+        self.trial_in_flight = False
+
+class ResilientClient(LLMClient):
+    """
+    Wraps an LLMClient with a per-call timeout, retries with jittered exponential
+    backoff, a circuit breaker, and optional hedging: if the first attempt has not
+    answered after hedge_delay() seconds (e.g. the model's p95), a second attempt
+    is started and whichever finishes first wins.
+    """
+
+    def __init__(self, client: LLMClient, name: str, timeout: float = 30.0, max_retries: int = 2,
+                 backoff_seconds: float = 0.2, max_backoff_seconds: float = 2.0,
+                 breaker: Optional[CircuitBreaker] = None,
+                 hedge_delay: Optional[Callable[[], Optional[float]]] = None):
+        self.client = client
+        self.name = name
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_delay = hedge_delay
+
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    @property
+    def needs_warm_up(self) -> bool:
+        return self.client.needs_warm_up
+
+    @property
+    def cost_per_1k_tokens(self) -> Optional[float]:
+        return self.client.cost_per_1k_tokens
+
+    async def warm_up(self):
+        await asyncio.wait_for(self.client.warm_up(), self.timeout)
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+    def _failed(self, error: ProviderError) -> ProviderError:
+        # Counted per attempt, so retried and hedged failures show up too
+        PROVIDER_ERRORS.inc(model=self.name, code=error.code)
+        return error
+
+    async def _attempt(self, prompt: str, max_tokens: int) -> tuple[str, float, int]:
+        try:
+            return await asyncio.wait_for(self.client.generate(prompt, max_tokens), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise self._failed(ProviderError(self.name, f"timed out after {self.timeout:.1f}s", code="timeout"))
+        except ProviderError as e:
+            # Report failures under the routed model's name
+            raise self._failed(ProviderError(self.name, e.message, e.retryable, e.code)) from e
+        except Exception as e:
+            raise self._failed(ProviderError(self.name, f"{type(e).__name__}: {e}", code="exception"))
+
+    async def _hedged_attempt(self, prompt: str, max_tokens: int) -> tuple[str, float, int]:
+        delay = self.hedge_delay() if self.hedge_delay else None
+        if not delay:
+            return await self._attempt(prompt, max_tokens)
+
+        first = asyncio.ensure_future(self._attempt(prompt, max_tokens))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.hedges += 1
+                pending.add(asyncio.ensure_future(self._attempt(prompt, max_tokens)))
+
+            # First success wins; fail only once every attempt has failed
+            while not any(task.exception() is None for task in done) and pending:
+                more, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                done |= more
+            for task in done:
+                if task.exception() is None:
+                    if task is not first:
+                        self.hedge_wins += 1
+                    return task.result()
+            raise first.exception() if first in done else next(iter(done)).exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def generate(self, prompt: str, max_tokens: int = 100) -> tuple[str, float, int]:
+        self.calls += 1
+        attempt = 0
+        while True:
+            try:
+                self.breaker.before_call(self.name)
+            except CircuitOpenError as e:
+                raise self._failed(e)
+            try:
+                result = await self._hedged_attempt(prompt, max_tokens)
+            except ProviderError as e:
+                self.breaker.record_failure()
+                if not e.retryable or attempt >= self.max_retries or self.breaker.state != "closed":
+                    self.failures += 1
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                self.retries += 1
+                continue
+            except BaseException:
+                self.breaker.release_trial()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def generate_stream(self, prompt: str, max_tokens: int = 100) -> AsyncIterator[tuple[str, float, int]]:
+        """Timeout applies per chunk; streams are not retried or hedged."""
+        self.calls += 1
+        try:
+            self.breaker.before_call(self.name)
+        except CircuitOpenError as e:
+            raise self._failed(e)
+        stream = self.client.generate_stream(prompt, max_tokens).__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise self._failed(ProviderError(self.name, f"stream stalled for {self.timeout:.1f}s", code="timeout"))
+                except ProviderError as e:
+                    raise self._failed(ProviderError(self.name, e.message, e.retryable, e.code)) from e
+                except Exception as e:
+                    raise self._failed(ProviderError(self.name, f"{type(e).__name__}: {e}", code="exception"))
+                yield chunk
+        except ProviderError:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            self.breaker.release_trial()
+            raise
+        finally:
+            await stream.aclose()
+        self.breaker.record_success()
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.times_opened,
+            "calls": self.calls,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins
+        }
@@ -0,0 +1,70 @@
+"""
+Keyset-paginated reads of request_logs for GET /logs.
+
+Pages are cut on the primary key instead of OFFSET, so fetching the next page
+(or tailing new rows with after_id) costs the same however large the table is:
+    after_id=N   rows with id > N, oldest first (poll with the last id seen)
+    before_id=N  rows with id < N, newest first (page back through history)
+Timestamps can tie, ids cannot, which is why the cursor is the id.
+"""
+import json
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import Select, select
+from .models import RequestLog
+
+COLUMNS = {column.name: column for column in RequestLog.__table__.columns}
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Comma-separated column names -> list (id always included). Raises ValueError on unknown names."""
+    if not fields:
+        return list(COLUMNS)
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown fields {unknown}. Available: {list(COLUMNS)}")
+    return ["id"] + [name for name in names if name != "id"]
+
+def _utc(value: datetime) -> datetime:
+    # Timestamps are stored as naive UTC
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+def build_query(fields: List[str], limit: int, after_id: Optional[int] = None, before_id: Optional[int] = None,
+                since: Optional[datetime] = None, before_timestamp: Optional[datetime] = None,
+                model: Optional[str] = None, difficulty: Optional[str] = None) -> Select:
+    """
+    Selected columns of matching rows, ordered by id: ascending when after_id is
+    given, otherwise newest first. model/difficulty filters use the (column, id) indexes.
+    """
+    query = select(*(COLUMNS[name] for name in fields))
+    if after_id is not None:
+        query = query.where(RequestLog.id > after_id)
+    if before_id is not None:
+        query = query.where(RequestLog.id < before_id)
+    if since is not None:
+        query = query.where(RequestLog.timestamp >= _utc(since))
+    if before_timestamp is not None:
+        query = query.where(RequestLog.timestamp < _utc(before_timestamp))
+    if model:
+        query = query.where(RequestLog.model_used == model)
+    if difficulty:
+        query = query.where(RequestLog.difficulty == difficulty)
+    order = RequestLog.id.asc() if after_id is not None else RequestLog.id.desc()
+    return query.order_by(order).limit(limit)
+
+def next_cursor(rows: List[dict], limit: int, after_id: Optional[int]) -> dict:
+    """Response headers pointing at the next page."""
+    if after_id is not None:
+        # Tailing: always hand back a cursor, even for an empty page, so the client can keep polling
+        return {"X-Next-After-Id": str(rows[-1]["id"] if rows else after_id)}
+    if len(rows) == limit:
+        return {"X-Next-Before-Id": str(rows[-1]["id"])}
+    return {}
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def to_ndjson(rows) -> str:
+    return "".join(json.dumps(row._asdict(), default=_json_default) + "\n" for row in rows)
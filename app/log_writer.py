@@ -0,0 +1,142 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncEngine
+from .config import settings
+from .database import async_engine as default_engine
+from .models import RequestLog
+from .stats import apply_deltas
+
+class RequestLogWriter:
+    """
+    Buffers RequestLog rows in a bounded in-memory queue and writes them
+    in bulk from a background task, off the request hot path.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine = None,
+        max_queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        self.engine = engine or default_engine
+        self.max_queue_size = max_queue_size or settings.LOG_QUEUE_MAX_SIZE
+        self.batch_size = batch_size or settings.LOG_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.LOG_FLUSH_INTERVAL_SECONDS
+        self.rows_written = 0
+        self.batches_written = 0
+        self.rows_dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background writer on the running event loop."""
+        if self._task is None or self._task.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, row: dict) -> float:
+        """
+        Queue a row for writing. Waits only when the queue is full, which
+        bounds memory and pushes back on callers while the database catches up.
+        Returns the time spent handing the row over (ms), also stored as its persist_ms.
+        """
+        start = time.perf_counter()
+        if self._task is None or self._task.done():
+            self.start()
+        row.setdefault("timestamp", datetime.now(timezone.utc))
+        await self._queue.put(row)
+        # The writer task can't have taken the row yet: nothing has awaited since the put
+        row["persist_ms"] = (time.perf_counter() - start) * 1000
+        return row["persist_ms"]
+
+    async def write_now(self, rows: List[dict]) -> float:
+        """Write rows immediately in a single bulk insert, bypassing the queue. Returns the write time (ms)."""
+        if not rows:
+            return 0.0
+        start = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        for row in rows:
+            row.setdefault("timestamp", now)
+        await self._flush(rows)
+        return (time.perf_counter() - start) * 1000
+
+    async def stop(self):
+        """Flush everything still queued and stop the writer."""
+        if self._task is None:
+            return
+        if not self._task.done():
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+        self._queue = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queue_size": self.max_queue_size,
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+            "rows_dropped": self.rows_dropped
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is None:
+                break
+            batch = [row]
+
+            # Collect until the batch is full or the flush interval elapses
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+
+            await self._flush(batch)
+
+        # Drain anything that was queued behind the stop marker
+        remaining = []
+        while not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is not None:
+                remaining.append(row)
+        for i in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[i:i + self.batch_size])
+
+    async def _flush(self, batch: List[dict]):
+        try:
+            await self._write_batch(batch)
+            self.rows_written += len(batch)
+            self.batches_written += 1
+        except Exception as e:
+            self.rows_dropped += len(batch)
+            print(f"Request log write failed, dropped {len(batch)} rows: {e}")
+
+    async def _write_batch(self, batch: List[dict]):
+        # executemany binds the columns of the first row, so give every row the same keys
+        columns = set().union(*batch)
+        rows = [{column: row.get(column) for column in columns} for row in batch]
+
+        # One transaction: one executemany plus the matching aggregate updates
+        async with self.engine.begin() as conn:
+            await conn.execute(insert(RequestLog), rows)
+            await conn.run_sync(apply_deltas, batch)
+
+# Shared writer used by the API
+request_log_writer = RequestLogWriter()
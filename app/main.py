@@ -1,17 +1,61 @@
+import asyncio
+import json
 import os
+from contextlib import asynccontextmanager
+from datetime import datetime
 from typing import Optional
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from .database import engine, Base, get_db
-from .models import PromptRequest, RouteResponse, RequestLog
+from .database import AsyncSessionLocal, async_engine, get_async_db, migrate
+from .models import PromptRequest, RouteResponse, RequestStat, BatchRouteRequest, BatchRouteItem, BatchRouteResponse
 from .router import ModelRouter
+from .admission import AdmissionRejected
+from .llm.base import ProviderError
+from .llm.http_client import http_pool
+from .classifier.cache import classification_cache
+from .log_writer import request_log_writer
+from .stats import ensure_aggregates, summarize
+from .log_query import build_query, next_cursor, parse_fields, to_ndjson
+from .metrics import metrics, register_collectors
+from .shared_state import shared_state
+from .config import settings, apply_api_keys
 
-# Create tables on startup
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create tables / indexes on startup. With --workers N every process does this at once,
+    # so a worker that loses the race to create a table retries and finds it there.
+    for attempt in range(3):
+        try:
+            async with async_engine.begin() as conn:
+                await conn.run_sync(migrate)
+                await conn.run_sync(ensure_aggregates)
+            break
+        except DBAPIError:
+            if attempt == 2:
+                raise
+            await asyncio.sleep(0.2 * (attempt + 1))
 
-app = FastAPI(title="Cost-Control Smart Model Router")
+    request_log_writer.start()
+    # Provider setup (model discovery) runs in the background so the server starts serving at once
+    warm_up = asyncio.create_task(router.warm_up())
+    # Exchange live model stats with the other workers (SHARED_STATE_BACKEND)
+    sync = asyncio.create_task(router.sync_shared_state()) if shared_state else None
+    yield
+    warm_up.cancel()
+    if sync:
+        sync.cancel()
+    # Flush queued request logs, then close pooled provider connections
+    await request_log_writer.stop()
+    await router.aclose()
+    await http_pool.aclose()
+    await async_engine.dispose()
+
+app = FastAPI(title="Cost-Control Smart Model Router", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,48 +66,106 @@ app.add_middleware(
 )
 
 router = ModelRouter()
+register_collectors(router, request_log_writer, classification_cache)
+
+def rejection(e: AdmissionRejected) -> HTTPException:
+    # 429 when the model's queue is full (retry shortly), 503 when the deadline ran out
+    headers = {"Retry-After": "1"} if e.status_code == 429 else None
+    return HTTPException(status_code=e.status_code, detail=str(e), headers=headers)
+
+@app.get("/ready")
+async def readiness():
+    """200 once every provider has finished warming up, 503 before; requests are served either way."""
+    body = {"ready": router.ready, "providers": router.warm_state, "provider_set": router.providers.version}
+    return JSONResponse(body, status_code=200 if router.ready else 503)
 
 @app.post("/route", response_model=RouteResponse)
-async def route_prompt(request: PromptRequest, db: Session = Depends(get_db)):
+async def route_prompt(request: PromptRequest):
     try:
-        result = await router.route_and_execute(request.prompt, db)
+        result = await router.route_and_execute(request.prompt, request.max_tokens, request.priority, request.deadline_ms)
         return result
+    except AdmissionRejected as e:
+        raise rejection(e)
+    except ProviderError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/route/stream")
+async def route_stream(request: PromptRequest):
+    """Server-sent events: "route" metadata, "token" chunks, then a final "done" event."""
+    async def events():
+        try:
+            async for event, data in router.route_stream(request.prompt, request.max_tokens, request.priority, request.deadline_ms):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except AdmissionRejected as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e), 'status_code': e.status_code})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/route/batch", response_model=BatchRouteResponse)
+async def route_batch(request: BatchRouteRequest):
+    if len(request.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {settings.BATCH_MAX_ITEMS} items")
+    try:
+        results = await router.route_batch([
+            (item.prompt, item.max_tokens, item.priority, item.deadline_ms) for item in request.items
+        ])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    return BatchRouteResponse(results=[
+        BatchRouteItem(index=i, result=result)
+        if isinstance(result, RouteResponse)
+        else BatchRouteItem(index=i, error=str(result) or type(result).__name__)
+        for i, result in enumerate(results)
+    ])
+
 @app.get("/stats")
-def get_stats(db: Session = Depends(get_db)):
-    logs = db.query(RequestLog).all()
-    total_cost = sum(log.cost for log in logs)
-    total_requests = len(logs)
-    
-    # Group by model
-    breakdown = {}
-    for log in logs:
-        if log.model_used not in breakdown:
-            breakdown[log.model_used] = {"count": 0, "cost": 0.0}
-        breakdown[log.model_used]["count"] += 1
-        breakdown[log.model_used]["cost"] += log.cost
-        
-    return {
-        "total_requests": total_requests,
-        "total_cost_usd": total_cost,
-        "breakdown": breakdown
-    }
+async def get_stats(db: AsyncSession = Depends(get_async_db)):
+    # Served from the running totals in request_stats, not a scan of request_logs
+    result = await db.execute(select(RequestStat))
+    stats = summarize(result.scalars().all())
+    if hasattr(router.classifier, "stats"):
+        stats["classifier"] = router.classifier.stats()
+    if settings.REQUEST_COALESCING:
+        stats["coalescing"] = {"in_flight": len(router._inflight), "coalesced_requests": router.coalesced}
+    if settings.SPECULATIVE_EXECUTION:
+        stats["speculative"] = dict(router.speculation, tier=settings.SPECULATIVE_TIER)
+    stats["routing"] = {"policy": router.policy.name, "models": router.model_stats.snapshot()}
+    stats["stage_latency_ms"] = router.stage_timings.snapshot()
+    stats["admission"] = router.admission.stats()
+    stats["providers"] = {name: client.stats() for name, client in router.models.items()}
+    stats["provider_set"] = dict(router.providers.stats(), draining=[p.stats() for p in router.draining])
+    stats["classification_cache"] = classification_cache.stats()
+    if router.response_cache is not None:
+        stats["response_cache"] = router.response_cache.stats()
+    stats["log_writer"] = request_log_writer.stats()
+    stats["shared_state"] = shared_state.stats() if shared_state else {"backend": "memory"}
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Prometheus text format, built from in-memory counters only (no database access).
+    # Async so the registry is read on the event loop, the only place it is written.
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 class KeyConfig(BaseModel):
     OPENAI_API_KEY: Optional[str] = None
     GOOGLE_API_KEY: Optional[str] = None
 
 @app.post("/config/keys")
-def update_keys(config: KeyConfig):
+async def update_keys(config: KeyConfig):
     env_path = ".env"
     
-    # 1. Update os.environ for immediate use
-    if config.OPENAI_API_KEY:
-        os.environ["OPENAI_API_KEY"] = config.OPENAI_API_KEY
-    if config.GOOGLE_API_KEY:
-        os.environ["GOOGLE_API_KEY"] = config.GOOGLE_API_KEY
+    # 1. Update os.environ and settings for immediate use
+    apply_api_keys(config.model_dump())
         
     # 2. Update .env file for persistence
     # Read existing lines
@@ -99,10 +201,54 @@ def update_keys(config: KeyConfig):
         
     with open(env_path, "w") as f:
         f.writelines(new_lines)
+    
+    # 3. Build, warm and swap in new clients and classifier; in-flight requests finish on the old ones.
+    # Other workers see the bumped version on their next shared state sync and reload from .env.
+    if shared_state:
+        router.keys_version = await shared_state.incr("config", "keys_version") or router.keys_version
+    router.reload_in_background()
         
-    return {"status": "success", "message": "API keys updated successfully."}
+    return {"status": "success", "message": "API keys updated successfully. Providers are reloading in the background."}
 
 @app.get("/logs")
-def get_logs(limit: int = 50, db: Session = Depends(get_db)):
-    logs = db.query(RequestLog).order_by(RequestLog.timestamp.desc()).limit(limit).all()
-    return logs
+async def get_logs(
+    response: Response,
+    limit: int = 50,
+    after_id: Optional[int] = None,
+    before_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    before_timestamp: Optional[datetime] = None,
+    model: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: str = "json",
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Request logs, newest first, or oldest first after `after_id` (for tailing).
+    Keyset-paginated on id: follow X-Next-Before-Id / X-Next-After-Id, or with
+    format=ndjson (streamed) the id of the last line.
+    """
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    max_limit = settings.LOGS_MAX_PAGE_SIZE if format == "json" else settings.LOGS_MAX_EXPORT_ROWS
+    if not 1 <= limit <= max_limit:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {max_limit}")
+    try:
+        columns = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query = build_query(columns, limit, after_id, before_id, since, before_timestamp, model, difficulty)
+
+    if format == "ndjson":
+        async def lines():
+            # Own session: the request's one is closed before a streamed body is sent
+            async with AsyncSessionLocal() as session:
+                result = await session.stream(query)
+                async for rows in result.partitions(500):
+                    yield to_ndjson(rows)
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    rows = [row._asdict() for row in (await db.execute(query)).all()]
+    response.headers.update(next_cursor(rows, limit, after_id))
+    return rows
@@ -0,0 +1,226 @@
+"""
+In-process metrics served at /metrics in the Prometheus text format.
+
+Everything runs on the event loop, so updates are plain dict/list writes with
+no locks; render() must be called on the loop too (the /metrics endpoint is async). Values derived from other components (queue depths, cache hit counts)
+are read through callbacks at scrape time, so they cost nothing per request.
+"""
+import traceback
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from .model_stats import STAGES
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+
+    def _key(self, labels: dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    @abstractmethod
+    def lines(self) -> List[str]:
+        """Exposition lines for this metric's samples, without HELP/TYPE."""
+        pass
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def lines(self) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in self._values.items()]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def lines(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+class CallbackMetric(Metric):
+    """Values read at scrape time: fn() returns (label_values, value) pairs."""
+
+    def __init__(self, name: str, help: str, kind: str, labels: Iterable[str],
+                 fn: Callable[[], Iterable[Tuple[Tuple, float]]]):
+        super().__init__(name, help, labels)
+        self.kind = kind
+        self.fn = fn
+
+    def lines(self) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in self.fn()]
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        # Rendered after everything else so a scrape reports its own collection failures
+        self.collect_errors = Counter("router_metrics_collect_errors_total",
+                                      "Metrics left out of a scrape because collecting them failed", ("metric",))
+
+    def register(self, metric: Metric) -> Metric:
+        # Re-registering a name replaces it (e.g. callbacks bound to a new router)
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name: str, help: str, kind: str, labels: Iterable[str],
+                 fn: Callable[[], Iterable[Tuple[Tuple, float]]]) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, kind, labels, fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.lines()
+            except Exception:
+                # One broken callback shouldn't take down the whole scrape
+                print(f"Metric {metric.name} failed to collect:\n{traceback.format_exc()}")
+                self.collect_errors.inc(metric=metric.name)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        lines.append(f"# HELP {self.collect_errors.name} {self.collect_errors.help}")
+        lines.append(f"# TYPE {self.collect_errors.name} {self.collect_errors.kind}")
+        lines.extend(self.collect_errors.lines())
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+REQUESTS = metrics.counter("router_requests_total", "Routed requests", ("difficulty", "model", "outcome"))
+COST = metrics.counter("router_cost_usd_total", "Provider spend in USD", ("model",))
+TOKENS = metrics.counter("router_tokens_total", "Tokens used", ("model",))
+REQUEST_LATENCY = metrics.histogram("router_request_latency_seconds", "End-to-end request latency", ("model",))
+STAGE_LATENCY = metrics.histogram("router_stage_latency_seconds", "Latency of each request stage", ("stage", "model"))
+CLASSIFIER_DECISIONS = metrics.counter("router_classifier_decisions_total", "Classifications by the stage that decided", ("source",))
+PROVIDER_ERRORS = metrics.counter("router_provider_errors_total", "Failed provider attempts by error code", ("model", "code"))
+
+def classifier_source(reasoning: Optional[str]) -> str:
+    """Which classifier decided, from the prefixes the classifiers put in reasoning."""
+    reasoning = reasoning or ""
+    if "[Gemini Classifier]" in reasoning or "[OpenAI Classifier]" in reasoning:
+        return "llm"
+    if "[Local Classifier]" in reasoning:
+        return "local_model"
+    return "rules"
+
+def observe_request(row: dict):
+    """Record one request from its RequestLog row."""
+    if row.get("cached"):
+        outcome = "cached"
+    elif row.get("coalesced"):
+        outcome = "coalesced"
+    else:
+        outcome = row.get("outcome") or "success"
+    model = row.get("model_used") or "unknown"
+
+    REQUESTS.inc(difficulty=row.get("difficulty") or "unknown", model=model, outcome=outcome)
+    COST.inc(row.get("cost") or 0.0, model=model)
+    TOKENS.inc(row.get("tokens_used") or 0, model=model)
+    if row.get("response_time_ms") is not None:
+        REQUEST_LATENCY.observe(row["response_time_ms"] / 1000, model=model)
+    for stage in STAGES:
+        if row.get(stage) is not None:
+            STAGE_LATENCY.observe(row[stage] / 1000, stage=stage[:-len("_ms")], model=model)
+    if outcome not in ("cached", "coalesced"):
+        CLASSIFIER_DECISIONS.inc(source=row.get("label_source") or classifier_source(row.get("reasoning")))
+
+def register_collectors(router, log_writer, classification_cache):
+    """Scrape-time metrics read from the router's components (nothing extra per request)."""
+    gates = lambda: router.admission.gates.items()
+    metrics.callback("router_admission_active", "Provider calls in flight per model", "gauge", ("model",),
+                     lambda: [((name,), gate.active) for name, gate in gates()])
+    metrics.callback("router_admission_limit", "Concurrency limit per model", "gauge", ("model",),
+                     lambda: [((name,), gate.limit) for name, gate in gates()])
+    metrics.callback("router_admission_queue_depth", "Requests waiting for a slot per model", "gauge", ("model",),
+                     lambda: [((name,), gate.queue_depth) for name, gate in gates()])
+    metrics.callback("router_admission_rejected_total", "Requests rejected by a full queue or deadline", "counter",
+                     ("model", "reason"),
+                     lambda: [row for name, gate in gates()
+                              for row in (((name, "queue_full"), gate.rejected), ((name, "deadline"), gate.timed_out))])
+
+    metrics.callback("router_log_writer_queue_depth", "Log rows waiting to be written", "gauge", (),
+                     lambda: [((), log_writer.stats()["queued"])])
+    metrics.callback("router_log_rows_dropped_total", "Log rows discarded after a failed database write", "counter", (),
+                     lambda: [((), log_writer.rows_dropped)])
+
+    def cache_lookups():
+        caches = [("classification", classification_cache)]
+        if router.response_cache is not None:
+            caches.append(("response", router.response_cache))
+        return [row for name, cache in caches
+                for row in (((name, "hit"), cache.hits), ((name, "miss"), cache.misses))]
+    metrics.callback("router_cache_lookups_total", "Cache lookups by cache and result", "counter",
+                     ("cache", "result"), cache_lookups)
+
+    metrics.callback("router_provider_circuit_open", "1 while a model's circuit breaker is not closed", "gauge",
+                     ("model",),
+                     lambda: [((name,), int(client.breaker.state != "closed")) for name, client in router.models.items()])
+    metrics.callback("router_provider_retries_total", "Provider call retries", "counter", ("model",),
+                     lambda: [((name,), client.retries) for name, client in router.models.items()])
+    metrics.callback("router_provider_hedges_total", "Hedged provider attempts", "counter", ("model",),
+                     lambda: [((name,), client.hedges) for name, client in router.models.items()])
+    metrics.callback("router_coalescing_in_flight", "Distinct prompts in flight that others can join", "gauge", (),
+                     lambda: [((), len(router._inflight))])
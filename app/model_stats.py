@@ -0,0 +1,175 @@
+import math
+import time
+from collections import deque
+from typing import Dict, Optional
+
+def percentile(values, q: float) -> Optional[float]:
+    """Nearest-rank percentile (0-100), or None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(max(math.ceil(q / 100 * len(ordered)), 1), len(ordered))
+    return ordered[rank - 1]
+
+class ModelStats:
+    """
+    Live latency/error/cost statistics for one model: EWMAs for a smooth trend,
+    plus a ring buffer of recent latencies for percentiles. Samples older than
+    window_seconds drop out, so a model that stops receiving traffic forgets
+    its old percentiles instead of being judged on them forever.
+
+    `remote` holds the same model's exported stats from other worker processes;
+    percentiles and EWMAs are computed over this worker's data and theirs.
+    """
+
+    def __init__(self, alpha: float = 0.2, window: int = 200, window_seconds: float = 60.0):
+        self.alpha = alpha
+        self.window_seconds = window_seconds
+        # (recorded_at, latency_ms)
+        self.latencies = deque(maxlen=window)
+        # This worker's EWMAs
+        self.local = {"ewma_latency_ms": None, "ewma_error_rate": 0.0, "ewma_cost": None}
+        self.requests = 0
+        self.errors = 0
+        # worker id -> export() of that worker
+        self.remote: Dict[str, dict] = {}
+
+    def _ewma(self, current: Optional[float], value: float) -> float:
+        return value if current is None else current + self.alpha * (value - current)
+
+    def record(self, latency_ms: float, ok: bool = True, cost: float = 0.0):
+        self.requests += 1
+        self.latencies.append((time.time(), latency_ms))
+        local = self.local
+        local["ewma_latency_ms"] = self._ewma(local["ewma_latency_ms"], latency_ms)
+        local["ewma_error_rate"] = self._ewma(local["ewma_error_rate"], 0.0 if ok else 1.0)
+        if ok:
+            local["ewma_cost"] = self._ewma(local["ewma_cost"], cost)
+        else:
+            self.errors += 1
+
+    def _expire(self):
+        cutoff = time.time() - self.window_seconds
+        while self.latencies and self.latencies[0][0] < cutoff:
+            self.latencies.popleft()
+
+    def _recent(self) -> list:
+        """Recent latencies from this worker and the others."""
+        self._expire()
+        cutoff = time.time() - self.window_seconds
+        values = [latency for _, latency in self.latencies]
+        for data in self.remote.values():
+            values.extend(latency for recorded_at, latency in data["latencies"] if recorded_at >= cutoff)
+        return values
+
+    def _merged(self, field: str) -> Optional[float]:
+        """This worker's EWMA averaged with the others', weighted by recent sample counts."""
+        parts = [(self.local[field], len(self.latencies))]
+        parts += [(data[field], len(data["latencies"])) for data in self.remote.values()]
+        parts = [(value, max(count, 1)) for value, count in parts if value is not None]
+        if not parts:
+            return None
+        return sum(value * count for value, count in parts) / sum(count for _, count in parts)
+
+    @property
+    def ewma_latency_ms(self) -> Optional[float]:
+        return self._merged("ewma_latency_ms")
+
+    @property
+    def ewma_error_rate(self) -> float:
+        return self._merged("ewma_error_rate") or 0.0
+
+    @property
+    def ewma_cost(self) -> Optional[float]:
+        return self._merged("ewma_cost")
+
+    @property
+    def samples(self) -> int:
+        return len(self._recent())
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile (0-100) over the recent window."""
+        return percentile(self._recent(), q)
+
+    def export(self) -> dict:
+        """This worker's own data, for other workers to merge."""
+        self._expire()
+        return dict(
+            self.local,
+            latencies=[(round(recorded_at, 3), round(latency, 2)) for recorded_at, latency in self.latencies]
+        )
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "samples": self.samples,
+            "workers": 1 + len(self.remote),
+            "ewma_latency_ms": self.ewma_latency_ms,
+            "p50_latency_ms": self.percentile(50),
+            "p95_latency_ms": self.percentile(95),
+            "ewma_error_rate": self.ewma_error_rate,
+            "ewma_cost": self.ewma_cost
+        }
+
+class ModelStatsRegistry:
+    """ModelStats per model name, created on first use."""
+
+    def __init__(self, alpha: float = 0.2, window: int = 200, window_seconds: float = 60.0):
+        self.alpha = alpha
+        self.window = window
+        self.window_seconds = window_seconds
+        self._models: Dict[str, ModelStats] = {}
+
+    def get(self, model: str) -> ModelStats:
+        stats = self._models.get(model)
+        if stats is None:
+            stats = self._models[model] = ModelStats(self.alpha, self.window, self.window_seconds)
+        return stats
+
+    def record(self, model: str, latency_ms: float, ok: bool = True, cost: float = 0.0):
+        self.get(model).record(latency_ms, ok, cost)
+
+    def export(self) -> Dict[str, dict]:
+        return {model: stats.export() for model, stats in self._models.items()}
+
+    def merge_remote(self, workers: Dict[str, Dict[str, dict]]):
+        """Replace the other workers' data with a fresh {worker: export()} read from the shared store."""
+        for stats in self._models.values():
+            stats.remote = {}
+        for worker, models in workers.items():
+            for model, data in models.items():
+                self.get(model).remote[worker] = data
+
+    def snapshot(self) -> dict:
+        return {model: stats.snapshot() for model, stats in self._models.items()}
+
+STAGES = ("classify_ms", "queue_wait_ms", "generate_ms", "time_to_first_token_ms", "persist_ms")
+
+class StageTimings:
+    """Recent per-stage timings (ms) per model, reported as p50/p95/p99."""
+
+    def __init__(self, window: int = 1000):
+        self.window = window
+        self._stages: Dict[str, Dict[str, deque]] = {}
+
+    def record(self, model: str, timings: dict):
+        stages = self._stages.setdefault(model, {})
+        for stage in STAGES:
+            value = timings.get(stage)
+            if value is not None:
+                stages.setdefault(stage, deque(maxlen=self.window)).append(value)
+
+    def snapshot(self) -> dict:
+        return {
+            model: {
+                stage: {
+                    "count": len(values),
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                    "p99": percentile(values, 99)
+                }
+                for stage, values in stages.items()
+            }
+            for model, stages in self._stages.items()
+        }
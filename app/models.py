@@ -1,7 +1,7 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text
+from sqlalchemy import Boolean, Column, Integer, String, Float, DateTime, Text, Index
 from sqlalchemy.sql import func
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from .database import Base
 
 # --- Database Models ---
@@ -13,15 +13,52 @@ class RequestLog(Base):
     prompt_preview = Column(String) # Store first N chars
     difficulty = Column(String)
     reasoning = Column(String) # New field
+    label_source = Column(String, nullable=True) # Classifier stage behind difficulty: "llm", "local_model" or "rules"
     model_used = Column(String)
     cost = Column(Float)
     tokens_used = Column(Integer)
     response_time_ms = Column(Float)
+    time_to_first_token_ms = Column(Float, nullable=True) # Streaming requests only
+    speculative = Column(String, nullable=True) # "hit", "wasted" or "cancelled" when speculation ran
+    wasted_cost = Column(Float, nullable=True) # Spend on a discarded speculative call
+    cached = Column(Boolean, nullable=True) # Served from the semantic response cache
+    coalesced = Column(Boolean, nullable=True) # Shared an identical in-flight request's result
+    routing_policy = Column(String, nullable=True) # ROUTING_POLICY in effect
+    rerouted_from = Column(String, nullable=True) # Tier's primary model when the policy moved the request
+    outcome = Column(String, nullable=True) # "success", "failover" or "error"
+    classify_ms = Column(Float, nullable=True) # Per-stage timings
+    queue_wait_ms = Column(Float, nullable=True)
+    generate_ms = Column(Float, nullable=True)
+    persist_ms = Column(Float, nullable=True)
+    error = Column(Text, nullable=True) # Provider error behind a failover or failure
+
+    __table_args__ = (
+        Index("ix_request_logs_timestamp", "timestamp"),
+        Index("ix_request_logs_model_used_timestamp", "model_used", "timestamp"),
+        Index("ix_request_logs_difficulty_timestamp", "difficulty", "timestamp"),
+        # Keyset pages of one model / difficulty (GET /logs?model=...&after_id=...)
+        Index("ix_request_logs_model_used_id", "model_used", "id"),
+        Index("ix_request_logs_difficulty_id", "difficulty", "id"),
+    )
+
+class RequestStat(Base):
+    """Running totals per model / per difficulty, maintained alongside request_logs"""
+    __tablename__ = "request_stats"
+
+    dimension = Column(String, primary_key=True) # "model" or "difficulty"
+    key = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    total_cost = Column(Float, nullable=False, default=0.0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    latency_sum_ms = Column(Float, nullable=False, default=0.0)
+    wasted_cost = Column(Float, nullable=True, default=0.0)
 
 # --- Pydantic Models ---
 class PromptRequest(BaseModel):
     prompt: str
     max_tokens: Optional[int] = 100
+    priority: int = 0  # Higher is admitted first when a model is at its concurrency limit
+    deadline_ms: Optional[int] = None  # Max wait for a model slot (default ADMISSION_DEFAULT_DEADLINE_MS)
 
 class RouteResponse(BaseModel):
     model: str
@@ -34,3 +71,25 @@ class RouteResponse(BaseModel):
     cost_without_routing: float = 0.0  # What GPT-4o would have cost
     savings: float = 0.0  # How much was saved
     savings_percentage: float = 0.0  # Percentage saved
+    cached: bool = False  # Served from the response cache (no model call, zero cost)
+    coalesced: bool = False  # Shared an identical in-flight request's result (zero cost)
+    rerouted_from: Optional[str] = None  # Primary model the routing policy moved this request away from
+    outcome: str = "success"  # "failover" when the chosen model failed and a fallback answered
+    error: Optional[str] = None  # The failed model's error on failover
+    # Per-stage timings (ms); None for stages a request skipped
+    classify_ms: Optional[float] = None
+    queue_wait_ms: Optional[float] = None  # Waiting for a model concurrency slot
+    generate_ms: Optional[float] = None
+    time_to_first_token_ms: Optional[float] = None  # Streaming only
+    persist_ms: Optional[float] = None  # Handing the log row to the writer (whole bulk write for batches)
+
+class BatchRouteRequest(BaseModel):
+    items: List[PromptRequest]
+
+class BatchRouteItem(BaseModel):
+    index: int
+    result: Optional[RouteResponse] = None
+    error: Optional[str] = None
+
+class BatchRouteResponse(BaseModel):
+    results: List[BatchRouteItem]
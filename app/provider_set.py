@@ -0,0 +1,82 @@
+"""
+The classifier and provider clients built from one set of API keys.
+
+When the keys change the router builds a new ProviderSet, warms it and swaps it in.
+Each request holds the set it started on (`use()`), so in-flight requests finish on
+the old clients; the old set's connection pool is closed once the last of them is done.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from .classifier.base import BaseClassifier
+from .llm.base import LLMClient
+from .llm.http_client import HTTPClientPool
+from .llm.resilience import ResilientClient
+
+class ProviderSet:
+    def __init__(self, version: int, http: HTTPClientPool, classifier: BaseClassifier,
+                 clients: Dict[str, LLMClient], models: Dict[str, ResilientClient]):
+        self.version = version
+        self.http = http
+        self.classifier = classifier
+        self.clients = clients # tier -> primary client
+        self.models = models # model name -> resilient client
+        self.created_at = time.time()
+
+        # Clients with setup work (model discovery) are warmed by warm_up()
+        self.warm_state = {
+            name: "pending" if client.needs_warm_up else "ready"
+            for name, client in models.items()
+        }
+
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def ready(self) -> bool:
+        return all(state in ("ready", "failed") for state in self.warm_state.values())
+
+    def is_warm(self, model: str) -> bool:
+        return self.warm_state.get(model) in ("ready", "failed")
+
+    async def warm_up(self):
+        """Warm every client that needs it, concurrently. Failures are reported, not raised."""
+        async def warm(name: str):
+            self.warm_state[name] = "warming"
+            start = time.perf_counter()
+            try:
+                await self.models[name].warm_up()
+            except Exception as e:
+                # The client still serves through its own fallback; readiness just reports the failure
+                self.warm_state[name] = "failed"
+                print(f"⚠ Warm-up failed for {name}: {type(e).__name__}: {e}")
+                return
+            self.warm_state[name] = "ready"
+            print(f"✓ {name} warmed up in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        await asyncio.gather(*(warm(name) for name, state in self.warm_state.items() if state == "pending"))
+
+    @contextmanager
+    def use(self):
+        """Hold this set for the duration of a request."""
+        self.in_flight += 1
+        self._idle.clear()
+        try:
+            yield self
+        finally:
+            self.in_flight -= 1
+            if self.in_flight == 0:
+                self._idle.set()
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Wait for the requests still using this set, then close its connection pool."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            print(f"⚠ Provider set v{self.version}: closing with {self.in_flight} requests still in flight")
+        await self.http.aclose()
+
+    def stats(self) -> dict:
+        return {"version": self.version, "in_flight": self.in_flight, "ready": self.ready}
@@ -0,0 +1,159 @@
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from .classifier.features import hash_features
+from .config import settings
+from .models import RouteResponse
+from .shared_state import WORKER_ID, SharedState, shared_state
+
+class SemanticResponseCache:
+    """
+    Serves a stored response when a new prompt is close enough to one already answered.
+    Prompts are embedded as hashed n-gram vectors (see classifier/features.py) and kept
+    in one preallocated matrix, so a lookup is a single matrix-vector product.
+    The similarity threshold is per difficulty tier of the cached answer.
+
+    With a shared state store, sync() (run by the router's shared state sync) appends
+    this worker's new entries to a shared log and pulls the other workers' into its
+    own matrix, so lookups and stores never wait on the store.
+    """
+
+    def __init__(self, max_size: int = 2000, ttl_seconds: float = 3600.0,
+                 dimensions: int = 2048, thresholds: Optional[Dict[str, float]] = None,
+                 shared: Optional[SharedState] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.dimensions = dimensions
+        self.thresholds = thresholds or {"simple": 0.9, "moderate": 0.95, "complex": 0.98}
+        self.hits = 0
+        self.misses = 0
+
+        # Row i of the matrix belongs to entries[i]; unused rows are zero
+        self._vectors = np.zeros((max_size, dimensions), dtype=np.float32)
+        self._created_at = np.zeros(max_size)
+        self._last_used = np.zeros(max_size)
+        self._max_tokens = np.full(max_size, -1, dtype=np.int64)
+        self._row_thresholds = np.full(max_size, np.inf, dtype=np.float32)
+        self._entries: list = [None] * max_size
+        self._size = 0
+
+        self.shared = shared
+        self.synced_entries = 0
+        # Last shared log position pulled (None until the first sync)
+        self._synced_seq: Optional[int] = None
+        # Entries stored since the last sync, waiting to be published
+        self._unpublished: List[dict] = []
+
+    def _embed(self, prompt: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        indices, values = hash_features(prompt, self.dimensions)
+        # Several n-grams can share a bucket at this size, so re-normalize after summing
+        np.add.at(vector, indices, values)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, prompt: str, max_tokens: int) -> Optional[tuple[RouteResponse, float]]:
+        """Returns: (cached response, similarity) or None."""
+        if not self._size:
+            self.misses += 1
+            return None
+
+        now = time.time()
+        n = self._size
+        similarity = self._vectors[:n] @ self._embed(prompt)
+        usable = (
+            (similarity >= self._row_thresholds[:n])
+            & (self._max_tokens[:n] == max_tokens)
+            & (now - self._created_at[:n] <= self.ttl_seconds)
+        )
+        if not usable.any():
+            self.misses += 1
+            return None
+
+        best = int(np.argmax(np.where(usable, similarity, -np.inf)))
+        self._last_used[best] = now
+        self.hits += 1
+        return self._entries[best], float(similarity[best])
+
+    def set(self, prompt: str, max_tokens: int, result: RouteResponse):
+        now = time.time()
+        self._insert(prompt, max_tokens, result, now)
+        if self.shared is not None and len(self._unpublished) < self.max_size:
+            self._unpublished.append({
+                "worker": WORKER_ID,
+                "prompt": prompt,
+                "max_tokens": max_tokens,
+                "result": result.model_dump(mode="json"),
+                "created_at": now
+            })
+
+    def _insert(self, prompt: str, max_tokens: int, result: RouteResponse, created_at: float):
+        row = self._free_row(time.time())
+        self._vectors[row] = self._embed(prompt)
+        self._created_at[row] = created_at
+        self._last_used[row] = created_at
+        self._max_tokens[row] = max_tokens
+        self._row_thresholds[row] = self.thresholds.get(result.difficulty, 1.0)
+        self._entries[row] = result
+
+    async def sync(self):
+        """Publish entries stored since the last sync, then pull the ones other workers added."""
+        if self.shared is None:
+            return
+        if self._unpublished:
+            entries, self._unpublished = self._unpublished, []
+            # Reserve a run of log positions for the whole batch
+            last = await self.shared.incr("response_cache", "seq", len(entries))
+            if last is not None:
+                first = last - len(entries) + 1
+                await self.shared.set_many("response_cache", {
+                    f"entry:{first + i}": entry for i, entry in enumerate(entries)
+                }, ttl=self.ttl_seconds)
+
+        latest = await self.shared.get("response_cache", "seq") or 0
+        if self._synced_seq is None:
+            # Start far enough back in the shared log to pick up what other workers already cached
+            self._synced_seq = max(latest - self.max_size, 0)
+        if latest <= self._synced_seq:
+            return
+        first = max(self._synced_seq + 1, latest - self.max_size + 1)
+        entries = await self.shared.get_many("response_cache", [f"entry:{seq}" for seq in range(first, latest + 1)])
+        self._synced_seq = latest
+        for entry in entries.values():
+            if entry["worker"] != WORKER_ID:
+                self._insert(entry["prompt"], entry["max_tokens"], RouteResponse(**entry["result"]), entry["created_at"])
+                self.synced_entries += 1
+
+    def _free_row(self, now: float) -> int:
+        if self._size < self.max_size:
+            self._size += 1
+            return self._size - 1
+        # Full: reuse an expired row, otherwise the least recently used one
+        expired = np.flatnonzero(now - self._created_at > self.ttl_seconds)
+        return int(expired[0]) if len(expired) else int(np.argmin(self._last_used))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": self._size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "thresholds": self.thresholds,
+            "shared": self.shared is not None,
+            "synced_entries": self.synced_entries
+        }
+
+def response_cache_from_settings() -> SemanticResponseCache:
+    return SemanticResponseCache(
+        max_size=settings.RESPONSE_CACHE_MAX_SIZE,
+        ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+        dimensions=settings.RESPONSE_CACHE_DIMENSIONS,
+        thresholds={
+            "simple": settings.RESPONSE_CACHE_THRESHOLD_SIMPLE,
+            "moderate": settings.RESPONSE_CACHE_THRESHOLD_MODERATE,
+            "complex": settings.RESPONSE_CACHE_THRESHOLD_COMPLEX
+        },
+        shared=shared_state
+    )
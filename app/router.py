@@ -1,53 +1,556 @@
-from sqlalchemy.orm import Session
+import asyncio
 import os
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Dict, List, Optional, Tuple, Union
 from .classifier.base import BaseClassifier
+from .classifier.cache import classification_cache, normalize_prompt
 from .classifier.rules import RuleBasedClassifier
 from .classifier.llm import LLMClassifier
-from .llm.base import LLMClient
-from .llm.providers import Phi3Client, GPT4oClient, GeminiClient
-from .config import settings
-from .models import RouteResponse, RequestLog
+from .classifier.factory import ClassifierFactory
+from .llm.base import LLMClient, ProviderError
+from .llm.http_client import HTTPClientPool
+from .llm.resilience import CircuitBreaker, ResilientClient
+from .llm.providers import Phi3Client, Llama3Client, GPT4oClient, GeminiClient
+from .provider_set import ProviderSet
+from .config import settings, reload_api_keys
+from .models import RouteResponse
+from .log_writer import RequestLogWriter, request_log_writer
+from .admission import admission_from_settings, deadline_from_ms
+from .model_stats import STAGES, ModelStatsRegistry, StageTimings
+from .routing_policy import RoutingDecision, RoutingPolicyFactory
+from .metrics import classifier_source, observe_request
+from .shared_state import WORKER_ID, shared_state
 import time
 
+if TYPE_CHECKING:
+    from .response_cache import SemanticResponseCache
+
+# Cached and coalesced responses did no classification or generation of their own
+NO_STAGES = {stage: None for stage in STAGES}
+
 class ModelRouter:
-    def __init__(self):
-        # Auto-detect: Use LLM classifier if API keys are available for smarter routing
+    def __init__(self, log_writer: RequestLogWriter = None):
+        self.log_writer = log_writer or request_log_writer
+
+        # Near-duplicate prompts are answered from memory (RESPONSE_CACHE_ENABLED)
+        self.response_cache: Optional["SemanticResponseCache"] = None
+        if settings.RESPONSE_CACHE_ENABLED:
+            # Imported here so numpy is only loaded when the cache is on
+            from .response_cache import response_cache_from_settings
+            self.response_cache = response_cache_from_settings()
+        
+        # In-flight (normalized prompt, max_tokens) -> leader task (REQUEST_COALESCING)
+        self._inflight: Dict[Tuple[str, int], asyncio.Task] = {}
+        self.coalesced = 0
+        
+        # Speculative execution outcomes (SPECULATIVE_EXECUTION)
+        self.speculation = {"hit": 0, "wasted": 0, "cancelled": 0, "wasted_cost": 0.0}
+        
+        self.model_names = {
+            "simple": "Phi-3-Mini",
+            "moderate": "Gemini 2.5 Flash",
+            "complex": "GPT-4o"
+        }
+        
+        # Every model the routing policy can pick, with the tier it belongs to
+        self.model_tiers = {
+            "Phi-3-Mini": "simple",
+            "Llama-3": "moderate",
+            "Gemini 2.5 Flash": "moderate",
+            "GPT-4o": "complex"
+        }
+        # Where each tier's traffic may go when its primary model is unhealthy or fails, in preference order
+        self.alternates = {
+            "simple": ["Llama-3"],
+            "moderate": ["Llama-3", "GPT-4o"],
+            "complex": ["Gemini 2.5 Flash"]
+        }
+        
+        # Live per-model latency/error statistics and the policy that reads them (ROUTING_POLICY)
+        self.model_stats = ModelStatsRegistry(
+            settings.MODEL_STATS_EWMA_ALPHA, settings.MODEL_STATS_WINDOW, settings.MODEL_STATS_WINDOW_SECONDS
+        )
+        self.policy = RoutingPolicyFactory.get_policy(settings.ROUTING_POLICY)
+        # Recent per-stage timings per model for p50/p95/p99 in /stats
+        self.stage_timings = StageTimings(settings.STAGE_TIMINGS_WINDOW)
+        
+        # Per-model concurrency limits with a priority queue in front of each
+        self.admission = admission_from_settings(self.model_tiers)
+        
+        # Classifier and provider clients for the current API keys, swapped as a unit by reload().
+        # Clients with setup work (model discovery) are warmed in the background by warm_up();
+        # until then their tier's traffic goes to a fallback model instead of waiting.
+        self.providers = self._build_providers(version=1)
+        self.draining: List[ProviderSet] = []
+        self._reload_lock = asyncio.Lock()
+        self._reload_tasks = set()
+        # Last API key version seen in the shared store (bumped by POST /config/keys on any worker)
+        self.keys_version = 0
+
+    # The current set's components; requests use the set they started on instead
+    @property
+    def classifier(self) -> BaseClassifier:
+        return self.providers.classifier
+
+    @property
+    def clients(self) -> Dict[str, LLMClient]:
+        return self.providers.clients
+
+    @property
+    def models(self) -> Dict[str, ResilientClient]:
+        return self.providers.models
+
+    @property
+    def warm_state(self) -> Dict[str, str]:
+        return self.providers.warm_state
+
+    def _build_providers(self, version: int) -> ProviderSet:
+        """Classifier and clients for the API keys in settings, on a connection pool of their own."""
+        http = HTTPClientPool()
         has_api_keys = settings.OPENAI_API_KEY or settings.GOOGLE_API_KEY
+        keys = f"OpenAI: {bool(settings.OPENAI_API_KEY)}, Google: {bool(settings.GOOGLE_API_KEY)}"
         
-        if settings.CLASSIFIER_TYPE == "llm" or has_api_keys:
-            self.classifier = LLMClassifier()
-            print(f"Using LLM-based classifier for intelligent routing (OpenAI: {bool(settings.OPENAI_API_KEY)}, Google: {bool(settings.GOOGLE_API_KEY)})")
+        # Auto-detect: Use the tiered classifier if API keys are available for smarter routing
+        if settings.CLASSIFIER_TYPE == "local":
+            classifier = ClassifierFactory.get_classifier("local")
+            print("Using local model classifier (no network calls)")
+        elif settings.CLASSIFIER_TYPE == "llm":
+            classifier = LLMClassifier(http)
+            print(f"Using LLM-based classifier for intelligent routing ({keys})")
+        elif settings.CLASSIFIER_TYPE == "tiered" or has_api_keys:
+            classifier = ClassifierFactory.get_classifier("tiered", remote=LLMClassifier(http))
+            print(f"Using tiered classifier: {classifier.local_name} first, LLM below confidence {classifier.threshold} ({keys})")
         else:
-            self.classifier = RuleBasedClassifier()
+            classifier = RuleBasedClassifier()
             print("Using rule-based classifier")
-            
-        self.clients = {
+        
+        clients = {
             "simple": Phi3Client(),
-            "moderate": GeminiClient(), # Use Gemini (falls back to Llama sim)
+            "moderate": GeminiClient(http), # Use Gemini (falls back to Llama sim)
             "complex": GPT4oClient()
         }
-        
-        self.model_names = {
-            "simple": "Phi-3-Mini",
-            "moderate": "Gemini 2.5 Flash",
-            "complex": "GPT-4o"
+        # Calls go through ResilientClient (timeouts, retries, circuit breaker, optional hedging)
+        models = {
+            self.model_names[tier]: self._resilient(self.model_names[tier], client)
+            for tier, client in clients.items()
         }
+        models["Llama-3"] = self._resilient("Llama-3", Llama3Client())
+        return ProviderSet(version, http, classifier, clients, models)
+
+    async def warm_up(self):
+        """Warm the current provider set (see ProviderSet.warm_up)."""
+        await self.providers.warm_up()
+
+    async def reload(self):
+        """
+        Rebuild the classifier and clients from the API keys now in settings, warm them and
+        swap them in. Requests already running finish on the old set, whose connection
+        pool is closed once they are done (or after PROVIDER_DRAIN_SECONDS).
+        """
+        async with self._reload_lock:
+            old = self.providers
+            new = self._build_providers(old.version + 1)
+            start = time.perf_counter()
+            await new.warm_up()
+            self.providers = new
+            print(f"✓ Provider set v{new.version} swapped in after {(time.perf_counter() - start) * 1000:.0f} ms "
+                  f"({old.in_flight} requests finishing on v{old.version})")
+
+        self.draining.append(old)
+        try:
+            await old.drain(settings.PROVIDER_DRAIN_SECONDS)
+        finally:
+            self.draining.remove(old)
 
-    async def route_and_execute(self, prompt: str, db: Session) -> RouteResponse:
+    def reload_in_background(self):
+        task = asyncio.create_task(self.reload())
+        # Keep a reference until it finishes
+        self._reload_tasks.add(task)
+        task.add_done_callback(self._reload_tasks.discard)
+
+    async def aclose(self):
+        """Close the connection pools of the current set and any still draining."""
+        for providers in [self.providers] + self.draining:
+            await providers.http.aclose()
+
+    async def sync_shared_state(self):
+        """
+        Every SHARED_STATE_SYNC_SECONDS: publish this worker's per-model stats, merge in the
+        other workers' (so routing sees fleet-wide latency), exchange new cache entries,
+        renew this worker's admission slot leases and purge expired shared entries.
+        Runs until cancelled.
+        """
+        interval = settings.SHARED_STATE_SYNC_SECONDS
+        # Keys saved before this worker started are already in its settings
+        self.keys_version = await shared_state.get("config", "keys_version") or 0
+        while True:
+            try:
+                await shared_state.set("model_stats", WORKER_ID, self.model_stats.export(), ttl=interval * 5)
+                others = {worker: data for worker, data in (await shared_state.items("model_stats")).items()
+                          if worker != WORKER_ID}
+                self.model_stats.merge_remote(others)
+                await classification_cache.publish()
+                if self.response_cache is not None:
+                    await self.response_cache.sync()
+                await shared_state.renew_slots(self.admission.gates, settings.SHARED_STATE_LEASE_SECONDS)
+                await shared_state.purge()
+                await self._check_keys_version()
+            except Exception as e:
+                print(f"⚠ Shared state sync failed: {type(e).__name__}: {e}")
+            await asyncio.sleep(interval)
+
+    async def _check_keys_version(self):
+        """Reload when another worker has saved new API keys (POST /config/keys bumps the version)."""
+        version = await shared_state.get("config", "keys_version")
+        if not version or version == self.keys_version:
+            return
+        self.keys_version = version
+        print(f"API keys changed on another worker (version {version}), reloading providers")
+        reload_api_keys()
+        self.reload_in_background()
+
+    @property
+    def ready(self) -> bool:
+        return self.providers.ready
+
+    async def route_and_execute(self, prompt: str, max_tokens: int = 100,
+                                priority: int = 0, deadline_ms: Optional[int] = None) -> RouteResponse:
+        """
+        priority orders requests waiting for a model's concurrency slot (higher first);
+        deadline_ms bounds that wait (default ADMISSION_DEFAULT_DEADLINE_MS).
+        Raises AdmissionRejected when the model's queue is full or the deadline passes.
+        """
+        deadline = deadline_from_ms(deadline_ms)
+        if not settings.REQUEST_COALESCING:
+            return await self._route_and_execute(prompt, max_tokens, priority, deadline)
+
+        # Identical prompts already in flight share one classification and generation
+        key = (normalize_prompt(prompt), max_tokens)
+        leader = self._inflight.get(key)
+        if leader is not None:
+            start_time = time.time()
+            result = await asyncio.shield(leader)
+            result = self._coalesced_response(result, start_time)
+            self.coalesced += 1
+            row = self._log_row(prompt, result)
+            row["coalesced"] = True
+            result.persist_ms = await self._log(row)
+            return result
+
+        # Shielded so followers still get a result if the first caller goes away
+        task = asyncio.ensure_future(self._route_and_execute(prompt, max_tokens, priority, deadline))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _route_and_execute(self, prompt: str, max_tokens: int, priority: int, deadline: float) -> RouteResponse:
         start_time = time.time()
+
+        # The request runs on the provider set current when it started, even if keys are swapped meanwhile
+        with self.providers.use() as providers:
+            # 0. Serve a near-identical earlier prompt without classifying or generating
+            if self.response_cache is not None:
+                cached = self.response_cache.get(prompt, max_tokens)
+                if cached:
+                    result = self._cached_response(*cached, start_time)
+                    row = self._log_row(prompt, result)
+                    row["cached"] = True
+                    result.persist_ms = await self._log(row)
+                    return result
         
-        # 1. Classify
-        if isinstance(self.classifier, LLMClassifier):
-            difficulty, reasoning = await self.classifier.classify_async(prompt)
-        else:
-            difficulty, reasoning = self.classifier.classify(prompt)
+            # Optionally start the likely target model while classification is in flight
+            speculative, speculative_decision = None, None
+            speculative_tier = settings.SPECULATIVE_TIER
+            speculative_timings = {}
+            if settings.SPECULATIVE_EXECUTION and speculative_tier in providers.clients:
+                speculative_decision = self._choose_model(providers, speculative_tier)
+                speculative = asyncio.create_task(self._generate(
+                    providers, speculative_decision.model, prompt, max_tokens, priority, deadline, speculative_timings
+                ))
         
-        # 2. Select Client
-        client = self.clients.get(difficulty, self.clients["complex"])
-        model_name = self.model_names.get(difficulty, "GPT-4o")
+            # 1. Classify
+            classify_start = time.perf_counter()
+            try:
+                difficulty, reasoning = await providers.classifier.classify_async(prompt)
+            except BaseException:
+                if speculative:
+                    speculative.cancel()
+                raise
+            classify_ms = (time.perf_counter() - classify_start) * 1000
         
-        # 3. Execute
-        response_text, cost, tokens = await client.generate(prompt)
+            # 2-3. Select client and execute (reusing the speculative call if the classifier agrees
+            # and the routing policy still picks the model it was started on)
+            outcome, wasted_cost = None, 0.0
+            decision = self._choose_model(providers, difficulty) if speculative else None
+            if speculative and difficulty == speculative_tier and decision.model == speculative_decision.model:
+                outcome = "hit"
+                generation, timings = speculative, speculative_timings
+            else:
+                if speculative:
+                    outcome, wasted_cost = self._discard_speculative(speculative)
+                generation, timings = None, {}
+            timings["classify_ms"] = classify_ms
+            if outcome:
+                self.speculation[outcome] += 1
+                self.speculation["wasted_cost"] += wasted_cost
+            speculation = {"speculative": outcome, "wasted_cost": wasted_cost} if outcome else {}
+        
+            try:
+                result = await self._execute(providers, prompt, difficulty, reasoning, max_tokens, start_time, priority, deadline,
+                                             generation, timings, decision)
+            except ProviderError as e:
+                # Failed requests are logged with a structured outcome, then surface to the caller
+                await self._log(dict(self._error_row(prompt, difficulty, reasoning, e, start_time), **speculation))
+                raise
+        
+            if self.response_cache is not None:
+                self.response_cache.set(prompt, max_tokens, result)
+        
+            # 4. Log (written in the background by the log writer)
+            row = self._log_row(prompt, result)
+            row.update(speculation)
+            result.persist_ms = await self._log(row)
+            self.stage_timings.record(result.model, result.model_dump(include=set(STAGES)))
+        
+            return result
+
+    @staticmethod
+    def _discard_speculative(task: asyncio.Task) -> Tuple[str, float]:
+        """
+        Drop a speculative call the classifier disagreed with.
+        Returns: (outcome, wasted_cost) - "wasted" with its cost if it had already
+        finished, otherwise "cancelled" (no cost is known for an aborted call).
+        """
+        if task.done() and not task.cancelled() and task.exception() is None:
+            return "wasted", task.result()[1]
+        task.cancel()
+        return "cancelled", 0.0
+
+    @staticmethod
+    def _coalesced_response(shared: RouteResponse, start_time: float) -> RouteResponse:
+        """A follower's copy of the leader's result; the provider call was only paid once."""
+        return shared.model_copy(update={
+            "cost": 0.0,
+            "latency_ms": (time.time() - start_time) * 1000,
+            "savings": shared.cost_without_routing,
+            "savings_percentage": 100.0 if shared.cost_without_routing > 0 else 0,
+            "coalesced": True,
+            **NO_STAGES
+        })
+
+    @staticmethod
+    def _cached_response(cached: RouteResponse, similarity: float, start_time: float) -> RouteResponse:
+        """A cache hit costs nothing, so the whole GPT-4o cost counts as saved."""
+        return cached.model_copy(update={
+            "reasoning": f"[Response cache, similarity {similarity:.2f}] {cached.reasoning}",
+            "cost": 0.0,
+            "latency_ms": (time.time() - start_time) * 1000,
+            "savings": cached.cost_without_routing,
+            "savings_percentage": 100.0 if cached.cost_without_routing > 0 else 0,
+            "cached": True,
+            **NO_STAGES
+        })
+
+    async def route_stream(self, prompt: str, max_tokens: int = 100,
+                           priority: int = 0, deadline_ms: Optional[int] = None) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Route a prompt and stream the generation.
+        Yields: (event, data) - one "route" event with the routing decision,
+        "token" events as text arrives, then a "done" event with cost and latency.
+        The RequestLog row is written once the stream completes.
+        """
+        start_time = time.time()
+        deadline = deadline_from_ms(deadline_ms)
+
+        # Held until the stream ends
+        with self.providers.use() as providers:
+            classify_start = time.perf_counter()
+            difficulty, reasoning = await providers.classifier.classify_async(prompt)
+            classify_ms = (time.perf_counter() - classify_start) * 1000
+            decision = self._choose_model(providers, difficulty)
+            reasoning = self._with_policy(reasoning, decision)
+            model_name = decision.model
+
+            # The slot is held for the whole stream
+            async with self.admission.slot(model_name, priority, deadline) as queue_wait_ms:
+                yield "route", {"model": model_name, "difficulty": difficulty, "reasoning": reasoning}
+
+                ttft = None
+                cost, tokens = 0.0, 0
+                generate_start = time.perf_counter()
+                ok = False
+                try:
+                    async for chunk, cost, tokens in providers.models[model_name].generate_stream(prompt, max_tokens):
+                        if chunk:
+                            if ttft is None:
+                                ttft = (time.time() - start_time) * 1000
+                            yield "token", {"text": chunk}
+                    ok = True
+                except ProviderError as e:
+                    await self._log(self._error_row(prompt, difficulty, reasoning, e, start_time))
+                    raise
+                finally:
+                    generate_ms = (time.perf_counter() - generate_start) * 1000
+                    self.model_stats.record(model_name, generate_ms, ok, cost)
+
+            latency = (time.time() - start_time) * 1000
+            gpt4o_cost = (tokens / 1000) * 0.03
+            savings = gpt4o_cost - cost
+            result = RouteResponse(
+                model=model_name,
+                difficulty=difficulty,
+                reasoning=reasoning,
+                response="",
+                cost=cost,
+                tokens=tokens,
+                latency_ms=latency,
+                cost_without_routing=gpt4o_cost,
+                savings=savings,
+                savings_percentage=(savings / gpt4o_cost * 100) if gpt4o_cost > 0 else 0,
+                rerouted_from=decision.rerouted_from,
+                classify_ms=classify_ms,
+                queue_wait_ms=queue_wait_ms,
+                generate_ms=generate_ms,
+                time_to_first_token_ms=ttft
+            )
+            result.persist_ms = await self._log(self._log_row(prompt, result))
+            self.stage_timings.record(model_name, result.model_dump(include=set(STAGES)))
+
+            done = result.model_dump(exclude={"model", "difficulty", "reasoning", "response", "rerouted_from"})
+            yield "done", done
+
+    async def route_batch(self, items: List[Tuple[str, int, int, Optional[int]]]) -> List[Union[RouteResponse, Exception]]:
+        """
+        Route many (prompt, max_tokens, priority, deadline_ms) items: classify them together,
+        generate with bounded concurrency per model, and write all logs in one bulk insert.
+        Results are in input order; failed items are returned as the exception.
+        """
+        start_time = time.time()
+
+        # One provider set for the whole batch
+        with self.providers.use() as providers:
+            prompts = [item[0] for item in items]
+            classify_start = time.perf_counter()
+            classifications = await providers.classifier.classify_many_async(prompts)
+            # One classification call serves the whole batch
+            classify_ms = (time.perf_counter() - classify_start) * 1000
+
+            # Keyed by the model actually chosen, so tiers the policy sends to one model share its limit
+            limits = {
+                model: asyncio.Semaphore(settings.BATCH_CONCURRENCY_PER_MODEL)
+                for model in providers.models
+            }
+
+            error_rows = []
+
+            async def run(item: Tuple[str, int, int, Optional[int]], difficulty: str, reasoning: str) -> RouteResponse:
+                prompt, max_tokens, priority, deadline_ms = item
+                # Taken before waiting on the batch's own limit, so the deadline covers that wait too
+                deadline = deadline_from_ms(deadline_ms)
+                decision = self._choose_model(providers, difficulty)
+                async with limits[decision.model]:
+                    try:
+                        return await self._execute(providers, prompt, difficulty, reasoning, max_tokens, start_time,
+                                                   priority, deadline, timings={"classify_ms": classify_ms},
+                                                   decision=decision)
+                    except ProviderError as e:
+                        error_rows.append(self._error_row(prompt, difficulty, reasoning, e, start_time))
+                        raise
+
+            results = await asyncio.gather(
+                *(
+                    run(item, difficulty, reasoning)
+                    for item, (difficulty, reasoning) in zip(items, classifications)
+                ),
+                return_exceptions=True
+            )
+
+            completed = [result for result in results if isinstance(result, RouteResponse)]
+            rows = [
+                self._log_row(prompt, result)
+                for prompt, result in zip(prompts, results)
+                if isinstance(result, RouteResponse)
+            ] + error_rows
+            persist_ms = await self.log_writer.write_now(rows)
+            for row in rows:
+                row["persist_ms"] = persist_ms
+                observe_request(row)
+            for result in completed:
+                result.persist_ms = persist_ms
+                self.stage_timings.record(result.model, result.model_dump(include=set(STAGES)))
+            return results
+
+    def _tier(self, difficulty: str) -> str:
+        return difficulty if difficulty in self.clients else "complex"
+
+    def _choose_model(self, providers: ProviderSet, difficulty: str) -> RoutingDecision:
+        """Ask the routing policy which model serves this tier right now."""
+        tier = self._tier(difficulty)
+        candidates = [(self.model_names[tier], tier)]
+        candidates += [(model, self.model_tiers[model]) for model in self.alternates.get(tier, [])]
+        list_prices = {
+            model: providers.models[model].cost_per_1k_tokens for model, _ in candidates if model in providers.models
+        }
+        decision = self.policy.choose(tier, candidates, self.model_stats, list_prices)
+        if not providers.is_warm(decision.model):
+            for model, _ in candidates:
+                if providers.is_warm(model):
+                    return RoutingDecision(model, decision.model, f"{decision.model} warming up, used {model}")
+        return decision
+
+    def _with_policy(self, reasoning: str, decision: RoutingDecision) -> str:
+        if decision.reason:
+            return f"[Policy {self.policy.name}: {decision.reason}] {reasoning}"
+        return reasoning
+
+    async def _generate(self, providers: ProviderSet, model: str, prompt: str, max_tokens: int, priority: int = 0,
+                        deadline: Optional[float] = None, timings: Optional[dict] = None) -> Tuple[str, float, int]:
+        """
+        Call the model once admitted under its concurrency limit, recording its latency.
+        Queue wait and generation time (ms) are added to timings, so failover attempts accumulate.
+        """
+        timings = {} if timings is None else timings
+        async with self.admission.slot(model, priority, deadline) as queue_wait_ms:
+            timings["queue_wait_ms"] = timings.get("queue_wait_ms", 0.0) + queue_wait_ms
+            start = time.perf_counter()
+            try:
+                response_text, cost, tokens = await providers.models[model].generate(prompt, max_tokens)
+            except ProviderError:
+                self.model_stats.record(model, (time.perf_counter() - start) * 1000, ok=False)
+                raise
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                timings["generate_ms"] = timings.get("generate_ms", 0.0) + elapsed
+            self.model_stats.record(model, elapsed, ok=True, cost=cost)
+            return response_text, cost, tokens
+
+    async def _execute(self, providers: ProviderSet, prompt: str, difficulty: str, reasoning: str, max_tokens: int, start_time: float,
+                       priority: int = 0, deadline: Optional[float] = None,
+                       generation: Optional[Awaitable] = None, timings: Optional[dict] = None,
+                       decision: Optional[RoutingDecision] = None) -> RouteResponse:
+        """
+        timings: stage timings so far; a precomputed generation must already be filling it.
+        decision: the routing decision already made (required with a precomputed generation).
+        """
+        timings = {} if timings is None else timings
+        # Execute (or await a generation already started for the chosen model)
+        if decision is None:
+            decision = self._choose_model(providers, difficulty)
+        reasoning = self._with_policy(reasoning, decision)
+        if generation is None:
+            generation = self._generate(providers, decision.model, prompt, max_tokens, priority, deadline, timings)
+        model_name = decision.model
+        outcome, error = "success", None
+        try:
+            response_text, cost, tokens = await generation
+        except ProviderError as e:
+            fallback = self._fallback_model(providers, model_name)
+            if fallback is None:
+                raise
+            print(f"{model_name} failed ({e}), failing over to {fallback}")
+            reasoning = f"[Failover: {model_name} failed, used {fallback}] {reasoning}"
+            outcome, error = "failover", str(e)
+            model_name = fallback
+            response_text, cost, tokens = await self._generate(providers, fallback, prompt, max_tokens, priority, deadline, timings)
         
         end_time = time.time()
         latency = (end_time - start_time) * 1000
@@ -58,20 +561,6 @@ class ModelRouter:
         savings = gpt4o_cost - cost
         savings_percentage = (savings / gpt4o_cost * 100) if gpt4o_cost > 0 else 0
         
-        # 4. Log
-        log_entry = RequestLog(
-            prompt_preview=prompt[:50],
-            difficulty=difficulty,
-            reasoning=reasoning,
-            model_used=model_name,
-            cost=cost,
-            tokens_used=tokens,
-            response_time_ms=latency
-        )
-        db.add(log_entry)
-        db.commit()
-        db.refresh(log_entry)
-        
         return RouteResponse(
             model=model_name,
             difficulty=difficulty,
@@ -82,5 +571,78 @@ class ModelRouter:
             latency_ms=latency,
             cost_without_routing=gpt4o_cost,
             savings=savings,
-            savings_percentage=savings_percentage
+            savings_percentage=savings_percentage,
+            rerouted_from=decision.rerouted_from,
+            outcome=outcome,
+            error=error,
+            classify_ms=timings.get("classify_ms"),
+            queue_wait_ms=timings.get("queue_wait_ms"),
+            generate_ms=timings.get("generate_ms")
         )
+
+    def _fallback_model(self, providers: ProviderSet, model: str) -> Optional[str]:
+        """First warm alternate for the model's tier that isn't the failed model and whose circuit isn't open."""
+        for alternate in self.alternates.get(self.model_tiers.get(model, "complex"), []):
+            if alternate != model and providers.is_warm(alternate) and providers.models[alternate].breaker.state != "open":
+                return alternate
+        return None
+
+    def _resilient(self, name: str, client: LLMClient) -> ResilientClient:
+        return ResilientClient(
+            client,
+            name,
+            timeout=settings.PROVIDER_TIMEOUT_SECONDS,
+            max_retries=settings.PROVIDER_MAX_RETRIES,
+            backoff_seconds=settings.PROVIDER_RETRY_BACKOFF_SECONDS,
+            breaker=CircuitBreaker(settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS),
+            hedge_delay=(lambda: self._hedge_delay(name)) if settings.HEDGE_REQUESTS else None
+        )
+
+    def _hedge_delay(self, model: str) -> Optional[float]:
+        """Seconds to wait before hedging: the model's recent p95, once there are enough samples."""
+        stats = self.model_stats.get(model)
+        if stats.samples < settings.ROUTING_MIN_SAMPLES:
+            return None
+        return max(stats.percentile(95), settings.HEDGE_MIN_DELAY_MS) / 1000
+
+    async def _log(self, row: dict) -> float:
+        """Queue a log row and count it in /metrics. Returns the hand-off time (ms)."""
+        persist_ms = await self.log_writer.submit(row)
+        observe_request(row)
+        return persist_ms
+
+    def _log_row(self, prompt: str, result: RouteResponse) -> dict:
+        return {
+            "prompt_preview": prompt[:50],
+            "difficulty": result.difficulty,
+            "reasoning": result.reasoning,
+            "label_source": classifier_source(result.reasoning),
+            "model_used": result.model,
+            "cost": result.cost,
+            "tokens_used": result.tokens,
+            "response_time_ms": result.latency_ms,
+            "routing_policy": self.policy.name,
+            "rerouted_from": result.rerouted_from,
+            "outcome": result.outcome,
+            "error": result.error,
+            "classify_ms": result.classify_ms,
+            "queue_wait_ms": result.queue_wait_ms,
+            "generate_ms": result.generate_ms,
+            "time_to_first_token_ms": result.time_to_first_token_ms
+        }
+
+    def _error_row(self, prompt: str, difficulty: str, reasoning: str, error: ProviderError, start_time: float) -> dict:
+        """Log row for a request that failed on every model tried."""
+        return {
+            "prompt_preview": prompt[:50],
+            "difficulty": difficulty,
+            "reasoning": reasoning,
+            "label_source": classifier_source(reasoning),
+            "model_used": error.provider,
+            "cost": 0.0,
+            "tokens_used": 0,
+            "response_time_ms": (time.time() - start_time) * 1000,
+            "routing_policy": self.policy.name,
+            "outcome": "error",
+            "error": str(error)
+        }
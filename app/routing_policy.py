@@ -0,0 +1,105 @@
+from typing import Dict, List, NamedTuple, Optional, Tuple, Type
+from .config import settings
+from .model_stats import ModelStats, ModelStatsRegistry
+
+TIER_ORDER = ["simple", "moderate", "complex"]
+
+class RoutingDecision(NamedTuple):
+    model: str
+    rerouted_from: Optional[str] = None
+    reason: Optional[str] = None
+
+class RoutingPolicy:
+    """Always uses the tier's primary model."""
+    name = "static"
+
+    def choose(self, difficulty: str, candidates: List[Tuple[str, str]], stats: ModelStatsRegistry,
+               list_prices: Optional[Dict[str, float]] = None) -> RoutingDecision:
+        """
+        candidates: (model, tier) pairs, the tier's primary model first, then alternates in preference order.
+        list_prices: static USD per 1K tokens per model, for cost checks before any cost is observed.
+        """
+        return RoutingDecision(candidates[0][0])
+
+class LatencyAwarePolicy(RoutingPolicy):
+    """
+    Moves traffic off a tier's primary model while its p95 latency is over the
+    tier's SLO (or its error rate is too high), to the first healthy alternate.
+    Alternates from a pricier tier are only used when their cost is within
+    ROUTING_MAX_COST_MULTIPLIER of the primary's: observed cost per request once
+    both have one, the clients' list prices per token until then.
+    """
+    name = "latency"
+
+    def __init__(self):
+        self.slo_ms = {
+            "simple": settings.ROUTING_SLO_MS_SIMPLE,
+            "moderate": settings.ROUTING_SLO_MS_MODERATE,
+            "complex": settings.ROUTING_SLO_MS_COMPLEX
+        }
+        self.max_error_rate = settings.ROUTING_MAX_ERROR_RATE
+        self.max_cost_multiplier = settings.ROUTING_MAX_COST_MULTIPLIER
+        self.min_samples = settings.ROUTING_MIN_SAMPLES
+
+    def _breach(self, stats: ModelStats, slo_ms: float) -> Optional[str]:
+        """Why the model is currently unhealthy, or None."""
+        if stats.samples < self.min_samples:
+            return None
+        p95 = stats.percentile(95)
+        if p95 > slo_ms:
+            return f"p95 {p95:.0f}ms > SLO {slo_ms:.0f}ms"
+        if stats.ewma_error_rate > self.max_error_rate:
+            return f"error rate {stats.ewma_error_rate:.0%} > {self.max_error_rate:.0%}"
+        return None
+
+    def _within_cost(self, primary: ModelStats, primary_tier: str, alternate: ModelStats, tier: str,
+                     primary_price: Optional[float], alternate_price: Optional[float]) -> bool:
+        if TIER_ORDER.index(tier) <= TIER_ORDER.index(primary_tier):
+            return True
+        # Pricier tier: only with a cost inside the ceiling, observed or else listed
+        if primary.ewma_cost is not None and alternate.ewma_cost is not None:
+            primary_cost, alternate_cost = primary.ewma_cost, alternate.ewma_cost
+        elif primary_price is not None and alternate_price is not None:
+            primary_cost, alternate_cost = primary_price, alternate_price
+        else:
+            return False
+        return alternate_cost <= primary_cost * self.max_cost_multiplier
+
+    def choose(self, difficulty: str, candidates: List[Tuple[str, str]], stats: ModelStatsRegistry,
+               list_prices: Optional[Dict[str, float]] = None) -> RoutingDecision:
+        list_prices = list_prices or {}
+        primary, primary_tier = candidates[0]
+        primary_stats = stats.get(primary)
+        slo_ms = self.slo_ms.get(difficulty, self.slo_ms["complex"])
+
+        # Once rerouted, the primary's samples age out of the window and it gets traffic again
+        breach = self._breach(primary_stats, slo_ms)
+        if breach is None:
+            return RoutingDecision(primary)
+
+        for model, tier in candidates[1:]:
+            alternate = stats.get(model)
+            within_cost = self._within_cost(primary_stats, primary_tier, alternate, tier,
+                                            list_prices.get(primary), list_prices.get(model))
+            if self._breach(alternate, slo_ms) is None and within_cost:
+                return RoutingDecision(model, primary, f"{primary} {breach}, rerouted to {model}")
+        return RoutingDecision(primary, reason=f"{primary} {breach}, no alternate within guardrails")
+
+class RoutingPolicyFactory:
+    _registry: Dict[str, Type[RoutingPolicy]] = {
+        "static": RoutingPolicy,
+        "latency": LatencyAwarePolicy
+    }
+
+    @classmethod
+    def register(cls, name: str, policy_cls: Type[RoutingPolicy]):
+        """Register a new routing policy class."""
+        cls._registry[name] = policy_cls
+
+    @classmethod
+    def get_policy(cls, name: str) -> RoutingPolicy:
+        """Get a routing policy instance by name."""
+        policy_cls = cls._registry.get(name)
+        if not policy_cls:
+            raise ValueError(f"Routing policy '{name}' not found. Available: {list(cls._registry.keys())}")
+        return policy_cls()
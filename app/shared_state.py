@@ -0,0 +1,391 @@
+"""
+State shared by every worker process (uvicorn --workers N): model discovery results,
+cache entries, admission slot counts and per-model live statistics.
+
+Backends (SHARED_STATE_BACKEND):
+  memory - nothing is shared; each worker keeps its own state in memory (default)
+  sqlite - a local SQLite file every worker on the host opens
+  redis  - a Redis-compatible server (pip install redis), for several hosts
+
+Values are JSON. Store errors are logged and treated as a miss / allowed call, so a
+broken shared store degrades to per-worker behaviour instead of failing requests.
+"""
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Optional, Type
+from .config import settings
+
+# Identifies this process in slot leases and per-worker statistics
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+class SharedState(ABC):
+    """
+    Namespaced key/value store with TTLs, counters and slot leases; subclasses implement the _methods.
+    The _methods block (file locks, network round trips), so the public methods run them in a
+    worker thread and the event loop keeps serving while the store is busy.
+    """
+    name = "base"
+
+    def __init__(self):
+        self.errors = 0
+
+    async def _safe(self, operation: str, fn, default=None):
+        try:
+            return await asyncio.to_thread(fn)
+        except Exception as e:
+            self.errors += 1
+            if self.errors == 1 or self.errors % 1000 == 0:
+                print(f"⚠ Shared state ({self.name}) {operation} failed: {type(e).__name__}: {e}")
+            return default
+
+    async def get(self, namespace: str, key: str) -> Any:
+        return await self._safe("get", lambda: self._get(namespace, key))
+
+    async def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        return await self._safe("get_many", lambda: self._get_many(namespace, keys), {}) if keys else {}
+
+    async def items(self, namespace: str) -> Dict[str, Any]:
+        """Every live entry in the namespace."""
+        return await self._safe("items", lambda: self._items(namespace), {})
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        await self._safe("set", lambda: self._set(namespace, key, value, ttl))
+
+    async def set_many(self, namespace: str, entries: Dict[str, Any], ttl: Optional[float] = None):
+        """Set several keys in one round trip / transaction."""
+        if entries:
+            await self._safe("set_many", lambda: self._set_many(namespace, entries, ttl))
+
+    async def add(self, namespace: str, key: str, value: Any, ttl: float) -> bool:
+        """Set only if absent (or expired). True when this call set it - usable as a lease."""
+        return await self._safe("add", lambda: self._add(namespace, key, value, ttl), False)
+
+    async def incr(self, namespace: str, key: str, amount: int = 1) -> Optional[int]:
+        return await self._safe("incr", lambda: self._incr(namespace, key, amount))
+
+    async def acquire_slot(self, name: str, limit: int, lease_seconds: float) -> bool:
+        """
+        Take one of `limit` slots for `name` across all workers. Each worker's holdings
+        stop counting lease_seconds after its last acquire/release/renew_slots, so a
+        crashed worker's slots are reclaimed. Fails open (True) if the store is unavailable.
+        """
+        return await self._safe("acquire_slot", lambda: self._acquire_slot(name, limit, lease_seconds), True)
+
+    async def release_slot(self, name: str, lease_seconds: float):
+        await self._safe("release_slot", lambda: self._release_slot(name, lease_seconds))
+
+    async def renew_slots(self, names: Iterable[str], lease_seconds: float):
+        """Heartbeat: keep this worker's slot holdings counted while it is alive."""
+        names = list(names)
+        await self._safe("renew_slots", lambda: self._renew_slots(names, lease_seconds))
+
+    async def purge(self):
+        """Drop expired entries (called periodically; reads already ignore them)."""
+        await self._safe("purge", self._purge)
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "worker": WORKER_ID, "errors": self.errors}
+
+    @abstractmethod
+    def _get(self, namespace: str, key: str) -> Any:
+        pass
+
+    @abstractmethod
+    def _get_many(self, namespace: str, keys: list) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def _items(self, namespace: str) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def _set(self, namespace: str, key: str, value: Any, ttl: Optional[float]):
+        pass
+
+    @abstractmethod
+    def _set_many(self, namespace: str, entries: Dict[str, Any], ttl: Optional[float]):
+        pass
+
+    @abstractmethod
+    def _add(self, namespace: str, key: str, value: Any, ttl: float) -> bool:
+        pass
+
+    @abstractmethod
+    def _incr(self, namespace: str, key: str, amount: int) -> int:
+        pass
+
+    @abstractmethod
+    def _acquire_slot(self, name: str, limit: int, lease_seconds: float) -> bool:
+        pass
+
+    @abstractmethod
+    def _release_slot(self, name: str, lease_seconds: float):
+        pass
+
+    @abstractmethod
+    def _renew_slots(self, names: list, lease_seconds: float):
+        pass
+
+    def _purge(self):
+        """Backends whose entries do not expire on their own delete expired ones here."""
+        pass
+
+class SQLiteState(SharedState):
+    """A SQLite file opened by every worker on the host (WAL, so readers never block)."""
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit; multi-statement updates use explicit BEGIN IMMEDIATE transactions
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                   timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS shared_kv ("
+            "namespace TEXT, key TEXT, value TEXT, expires_at REAL, PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS shared_slots ("
+            "name TEXT, holder TEXT, count INTEGER, expires_at REAL, PRIMARY KEY (name, holder)) WITHOUT ROWID"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """BEGIN IMMEDIATE, committed only if the block succeeds (caller holds self._lock)."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _get(self, namespace, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM shared_kv WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _get_many(self, namespace, keys):
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, value FROM shared_kv WHERE namespace = ? AND key IN ({placeholders}) "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, *keys, time.time())
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def _items(self, namespace):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, value FROM shared_kv WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, time.time())
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def _set(self, namespace, key, value, ttl):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO shared_kv VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), time.time() + ttl if ttl else None)
+            )
+
+    def _set_many(self, namespace, entries, ttl):
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock, self._transaction():
+            self._db.executemany(
+                "INSERT OR REPLACE INTO shared_kv VALUES (?, ?, ?, ?)",
+                [(namespace, key, json.dumps(value), expires_at) for key, value in entries.items()]
+            )
+
+    def _add(self, namespace, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO shared_kv VALUES (?, ?, ?, ?) ON CONFLICT (namespace, key) DO UPDATE "
+                "SET value = excluded.value, expires_at = excluded.expires_at "
+                "WHERE shared_kv.expires_at IS NOT NULL AND shared_kv.expires_at <= ?",
+                (namespace, key, json.dumps(value), now + ttl, now)
+            )
+        return cursor.rowcount == 1
+
+    def _incr(self, namespace, key, amount):
+        with self._lock:
+            row = self._db.execute(
+                "INSERT INTO shared_kv VALUES (?, ?, ?, NULL) ON CONFLICT (namespace, key) DO UPDATE "
+                "SET value = CAST(value AS INTEGER) + ? RETURNING value",
+                (namespace, key, json.dumps(amount), amount)
+            ).fetchone()
+        return int(row[0])
+
+    def _acquire_slot(self, name, limit, lease_seconds):
+        now = time.time()
+        with self._lock, self._transaction():
+            # Holdings of workers that stopped renewing (crashed) no longer count
+            held = self._db.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM shared_slots WHERE name = ? AND expires_at > ?",
+                (name, now)
+            ).fetchone()[0]
+            if held >= limit:
+                return False
+            self._db.execute(
+                "INSERT INTO shared_slots VALUES (?, ?, 1, ?) ON CONFLICT (name, holder) DO UPDATE "
+                "SET count = CASE WHEN expires_at > ? THEN count + 1 ELSE 1 END, expires_at = excluded.expires_at",
+                (name, WORKER_ID, now + lease_seconds, now)
+            )
+            return True
+
+    def _release_slot(self, name, lease_seconds):
+        with self._lock:
+            self._db.execute(
+                "UPDATE shared_slots SET count = MAX(count - 1, 0), expires_at = ? WHERE name = ? AND holder = ?",
+                (time.time() + lease_seconds, name, WORKER_ID)
+            )
+
+    def _renew_slots(self, names, lease_seconds):
+        with self._lock:
+            self._db.execute(
+                "UPDATE shared_slots SET expires_at = ? WHERE holder = ?",
+                (time.time() + lease_seconds, WORKER_ID)
+            )
+
+    def _purge(self):
+        now = time.time()
+        with self._lock:
+            self._db.execute("DELETE FROM shared_kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            self._db.execute("DELETE FROM shared_slots WHERE expires_at <= ?", (now,))
+
+    def stats(self) -> dict:
+        return dict(super().stats(), path=self.path)
+
+# KEYS[1] = slot hash (holder -> count); ARGV = holder, limit, lease_seconds, lease key prefix
+_REDIS_ACQUIRE = """
+local held = 0
+local entries = redis.call('HGETALL', KEYS[1])
+for i = 1, #entries, 2 do
+  if redis.call('EXISTS', ARGV[4] .. entries[i]) == 1 then
+    held = held + tonumber(entries[i + 1])
+  else
+    redis.call('HDEL', KEYS[1], entries[i])
+  end
+end
+if held >= tonumber(ARGV[2]) then return 0 end
+redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+redis.call('SET', ARGV[4] .. ARGV[1], 1, 'PX', math.floor(tonumber(ARGV[3]) * 1000))
+return 1
+"""
+
+class RedisState(SharedState):
+    """A Redis-compatible server; needs the optional `redis` package."""
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "router:"):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SHARED_STATE_BACKEND=redis needs the redis package: pip install redis")
+        self.url = url
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+        self._acquire = self._redis.register_script(_REDIS_ACQUIRE)
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.prefix}{namespace}:{key}"
+
+    def _get(self, namespace, key):
+        value = self._redis.get(self._key(namespace, key))
+        return json.loads(value) if value is not None else None
+
+    def _get_many(self, namespace, keys):
+        values = self._redis.mget([self._key(namespace, key) for key in keys])
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def _items(self, namespace):
+        pattern = self._key(namespace, "*")
+        keys = list(self._redis.scan_iter(match=pattern, count=500))
+        values = self._redis.mget(keys) if keys else []
+        start = len(self._key(namespace, ""))
+        return {key.decode()[start:]: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def _set(self, namespace, key, value, ttl):
+        self._redis.set(self._key(namespace, key), json.dumps(value), px=int(ttl * 1000) if ttl else None)
+
+    def _set_many(self, namespace, entries, ttl):
+        pipe = self._redis.pipeline()
+        for key, value in entries.items():
+            pipe.set(self._key(namespace, key), json.dumps(value), px=int(ttl * 1000) if ttl else None)
+        pipe.execute()
+
+    def _add(self, namespace, key, value, ttl):
+        return bool(self._redis.set(self._key(namespace, key), json.dumps(value), px=int(ttl * 1000), nx=True))
+
+    def _incr(self, namespace, key, amount):
+        return int(self._redis.incrby(self._key(namespace, key), amount))
+
+    def _acquire_slot(self, name, limit, lease_seconds):
+        return bool(self._acquire(
+            keys=[self._key("slots", name)],
+            args=[WORKER_ID, limit, lease_seconds, self._key("slot_lease", f"{name}:")]
+        ))
+
+    def _release_slot(self, name, lease_seconds):
+        pipe = self._redis.pipeline()
+        pipe.hincrby(self._key("slots", name), WORKER_ID, -1)
+        pipe.set(self._key("slot_lease", f"{name}:{WORKER_ID}"), 1, px=int(lease_seconds * 1000))
+        pipe.execute()
+
+    def _renew_slots(self, names, lease_seconds):
+        pipe = self._redis.pipeline()
+        for name in names:
+            pipe.set(self._key("slot_lease", f"{name}:{WORKER_ID}"), 1, px=int(lease_seconds * 1000))
+        pipe.execute()
+
+    def stats(self) -> dict:
+        return dict(super().stats(), url=self.url)
+
+class SharedStateFactory:
+    _registry: Dict[str, Type[SharedState]] = {
+        "sqlite": SQLiteState,
+        "redis": RedisState
+    }
+
+    @classmethod
+    def register(cls, name: str, backend_cls: Type[SharedState]):
+        """Register a new shared state backend class."""
+        cls._registry[name] = backend_cls
+
+    @classmethod
+    def get_backend(cls, name: str) -> SharedState:
+        """Get a shared state backend instance by name, configured from settings."""
+        backend_cls = cls._registry.get(name)
+        if not backend_cls:
+            raise ValueError(f"Shared state backend '{name}' not found. Available: {list(cls._registry.keys())}")
+        if backend_cls is SQLiteState:
+            return SQLiteState(settings.SHARED_STATE_PATH)
+        if backend_cls is RedisState:
+            return RedisState(settings.SHARED_STATE_REDIS_URL)
+        return backend_cls()
+
+def shared_state_from_settings() -> Optional[SharedState]:
+    """The configured store, or None for SHARED_STATE_BACKEND=memory."""
+    if settings.SHARED_STATE_BACKEND == "memory":
+        return None
+    return SharedStateFactory.get_backend(settings.SHARED_STATE_BACKEND)
+
+# One store per process, used by every component that coordinates with other workers
+shared_state = shared_state_from_settings()
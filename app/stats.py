@@ -0,0 +1,154 @@
+"""
+Incrementally maintained aggregates for /stats.
+
+Totals live in the small `request_stats` table and are updated in the same
+transaction as each request_logs batch, so reading them costs the same no
+matter how many requests have been logged.
+
+Rebuild from request_logs with:
+    python -m app.stats rebuild
+"""
+import sys
+from typing import Dict, Iterable, Tuple
+from sqlalchemy import delete, func, insert, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from .models import RequestLog, RequestStat
+
+# Aggregate dimension -> request_logs column it groups by
+DIMENSIONS = {
+    "model": RequestLog.model_used,
+    "difficulty": RequestLog.difficulty,
+}
+
+_ROW_KEYS = {
+    "model": "model_used",
+    "difficulty": "difficulty",
+}
+
+def aggregate_deltas(rows: Iterable[dict]) -> Dict[Tuple[str, str], list]:
+    """Sum a batch of log rows into (dimension, key) -> [count, cost, tokens, latency_ms, wasted_cost]."""
+    deltas: Dict[Tuple[str, str], list] = {}
+    for row in rows:
+        for dimension, row_key in _ROW_KEYS.items():
+            delta = deltas.setdefault((dimension, row.get(row_key) or "unknown"), [0, 0.0, 0, 0.0, 0.0])
+            delta[0] += 1
+            delta[1] += row.get("cost") or 0.0
+            delta[2] += row.get("tokens_used") or 0
+            delta[3] += row.get("response_time_ms") or 0.0
+            delta[4] += row.get("wasted_cost") or 0.0
+    return deltas
+
+def _upsert_insert(dialect_name: str):
+    """The dialect's INSERT ... ON CONFLICT construct, or None if it has none."""
+    if dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    elif dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        return None
+    return upsert
+
+def apply_deltas(conn: Connection, rows: Iterable[dict]):
+    """
+    Add a batch of log rows to the running totals (call inside the insert transaction).
+    Each total is a single upsert, so concurrent writers (several workers) creating the
+    same (dimension, key) row add to it instead of failing the whole batch.
+    """
+    upsert = _upsert_insert(conn.dialect.name)
+    for (dimension, key), (count, cost, tokens, latency, wasted) in aggregate_deltas(rows).items():
+        values = dict(
+            dimension=dimension,
+            key=key,
+            count=count,
+            total_cost=cost,
+            total_tokens=tokens,
+            latency_sum_ms=latency,
+            wasted_cost=wasted
+        )
+        totals = dict(
+            count=RequestStat.count + count,
+            total_cost=RequestStat.total_cost + cost,
+            total_tokens=RequestStat.total_tokens + tokens,
+            latency_sum_ms=RequestStat.latency_sum_ms + latency,
+            wasted_cost=func.coalesce(RequestStat.wasted_cost, 0.0) + wasted
+        )
+        if upsert is not None:
+            conn.execute(
+                upsert(RequestStat).values(**values)
+                .on_conflict_do_update(index_elements=[RequestStat.dimension, RequestStat.key], set_=totals)
+            )
+            continue
+        # Other dialects: update, insert if missing, and update again if another writer inserted first
+        where = (RequestStat.dimension == dimension, RequestStat.key == key)
+        if conn.execute(update(RequestStat).where(*where).values(**totals)).rowcount:
+            continue
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(RequestStat).values(**values))
+        except IntegrityError:
+            conn.execute(update(RequestStat).where(*where).values(**totals))
+
+def rebuild(conn: Connection):
+    """Recompute every aggregate from request_logs."""
+    conn.execute(delete(RequestStat))
+    for dimension, column in DIMENSIONS.items():
+        conn.execute(insert(RequestStat).from_select(
+            ["dimension", "key", "count", "total_cost", "total_tokens", "latency_sum_ms", "wasted_cost"],
+            select(
+                literal(dimension),
+                func.coalesce(column, "unknown"),
+                func.count(),
+                func.coalesce(func.sum(RequestLog.cost), 0.0),
+                func.coalesce(func.sum(RequestLog.tokens_used), 0),
+                func.coalesce(func.sum(RequestLog.response_time_ms), 0.0),
+                func.coalesce(func.sum(RequestLog.wasted_cost), 0.0)
+            ).group_by(func.coalesce(column, "unknown"))
+        ))
+
+def ensure_aggregates(conn: Connection):
+    """Backfill aggregates for databases that have logs but no totals yet."""
+    has_stats = conn.execute(select(RequestStat.key).limit(1)).first() is not None
+    has_logs = conn.execute(select(RequestLog.id).limit(1)).first() is not None
+    if has_logs and not has_stats:
+        print("Backfilling request_stats from request_logs...")
+        rebuild(conn)
+
+def summarize(stats: Iterable[RequestStat]) -> dict:
+    """Shape aggregate rows into the /stats response."""
+    breakdown = {}
+    by_difficulty = {}
+    for stat in stats:
+        entry = {
+            "count": stat.count,
+            "cost": stat.total_cost,
+            "tokens": stat.total_tokens,
+            "avg_latency_ms": (stat.latency_sum_ms / stat.count) if stat.count else 0.0,
+            "wasted_speculative_cost": stat.wasted_cost or 0.0
+        }
+        if stat.dimension == "model":
+            breakdown[stat.key] = entry
+        elif stat.dimension == "difficulty":
+            by_difficulty[stat.key] = entry
+
+    return {
+        "total_requests": sum(entry["count"] for entry in breakdown.values()),
+        "total_cost_usd": sum(entry["cost"] for entry in breakdown.values()),
+        "total_wasted_speculative_cost_usd": sum(entry["wasted_speculative_cost"] for entry in breakdown.values()),
+        "breakdown": breakdown,
+        "by_difficulty": by_difficulty
+    }
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.stats rebuild")
+        sys.exit(1)
+
+    from .database import engine, migrate
+    with engine.begin() as conn:
+        migrate(conn)
+        rebuild(conn)
+        total = conn.execute(
+            select(func.sum(RequestStat.count)).where(RequestStat.dimension == "model")
+        ).scalar() or 0
+    print(f"Rebuilt request_stats from {total} logged requests.")
@@ -0,0 +1,233 @@
+"""
+Load benchmark for the router: drives /route, /route/batch and /stats at increasing
+concurrency and reports throughput and p50/p95/p99 latency as JSON, so runs can be
+compared between commits.
+
+Against a router that is already running:
+  python -m benchmarks.load --url http://localhost:8000 --output results.json
+
+Or let the harness start the mock provider and a router pointed at it:
+  python -m benchmarks.load --spawn --output results.json
+
+Compare with an earlier run:
+  python -m benchmarks.load --spawn --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import List, Optional
+import httpx
+from app.model_stats import percentile
+
+# A mix that lands on every tier with the rule-based classifier
+PROMPTS = [
+    "What is 2+2?",
+    "Define photosynthesis.",
+    "Hello there!",
+    "Write a python function to reverse a string.",
+    "How do I configure a reverse proxy with nginx?",
+    "Explain the difference between a process and a thread.",
+    "Analyze the long-term economic consequences of universal basic income, "
+    "comparing at least three historical experiments and their methodological weaknesses.",
+    "Write a short story about a lighthouse keeper who discovers the sea is a simulation, "
+    "then critique its narrative structure step by step."
+]
+
+def prompt_for(i: int, unique: bool) -> str:
+    prompt = PROMPTS[i % len(PROMPTS)]
+    # A request id keeps the caches and coalescing from hiding the provider path
+    return f"{prompt} (req {i})" if unique else prompt
+
+def summarize(endpoint: str, concurrency: int, latencies: List[float], statuses: Counter,
+              duration: float, items_per_request: int = 1) -> dict:
+    ok = statuses.get(200, 0)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": sum(statuses.values()),
+        "ok": ok,
+        "errors": {str(status): count for status, count in sorted(statuses.items(), key=str) if status != 200},
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(ok / duration, 2) if duration else 0.0,
+        "items_per_second": round(ok * items_per_request / duration, 2) if duration else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "max": max(latencies) if latencies else None
+        }
+    }
+
+async def run_level(client: httpx.AsyncClient, endpoint: str, concurrency: int, total: int,
+                    batch_size: int, unique: bool, offset: int) -> dict:
+    """Closed loop: `concurrency` workers send `total` requests between them."""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    next_index = iter(range(total))
+
+    def request(i: int):
+        n = offset + i
+        if endpoint == "route":
+            return client.post("/route", json={"prompt": prompt_for(n, unique), "max_tokens": 100})
+        if endpoint == "batch":
+            items = [{"prompt": prompt_for(n * batch_size + j, unique)} for j in range(batch_size)]
+            return client.post("/route/batch", json={"items": items})
+        return client.get("/stats")
+
+    async def worker():
+        for i in next_index:
+            start = time.perf_counter()
+            try:
+                response = await request(i)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+                continue
+            latencies.append(round((time.perf_counter() - start) * 1000, 2))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    duration = time.perf_counter() - start
+    return summarize(endpoint, concurrency, latencies, statuses, duration,
+                     batch_size if endpoint == "batch" else 1)
+
+async def run(args) -> dict:
+    results = []
+    offset = 0
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2, max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        for endpoint in args.endpoints:
+            for concurrency in args.concurrency:
+                if args.warmup:
+                    await run_level(client, endpoint, min(concurrency, args.warmup), args.warmup,
+                                    args.batch_size, args.unique_prompts, offset)
+                    offset += args.warmup
+                result = await run_level(client, endpoint, concurrency, args.requests,
+                                         args.batch_size, args.unique_prompts, offset)
+                offset += args.requests
+                latency = result["latency_ms"]
+                print(f"{endpoint:>6} c={concurrency:<4} {result['throughput_rps']:>8.1f} req/s  "
+                      f"p50={latency['p50']}ms p95={latency['p95']}ms p99={latency['p99']}ms  "
+                      f"errors={result['errors'] or 0}", file=sys.stderr)
+                results.append(result)
+    return {"meta": run_metadata(args), "results": results}
+
+def run_metadata(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "url": args.url,
+        "spawned": args.spawn,
+        "requests_per_level": args.requests,
+        "batch_size": args.batch_size,
+        "unique_prompts": args.unique_prompts,
+        "python": platform.python_version(),
+        "platform": platform.platform()
+    }
+
+def compare(current: dict, baseline: dict):
+    """Print throughput and p95 changes against an earlier run."""
+    before = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\nvs {baseline['meta'].get('commit')}:", file=sys.stderr)
+    for result in current["results"]:
+        old = before.get((result["endpoint"], result["concurrency"]))
+        if not old:
+            continue
+        def change(new, prev):
+            return f"{(new - prev) / prev * 100:+.1f}%" if new is not None and prev else "n/a"
+        print(f"{result['endpoint']:>6} c={result['concurrency']:<4} "
+              f"throughput {change(result['throughput_rps'], old['throughput_rps'])}  "
+              f"p95 {change(result['latency_ms']['p95'], old['latency_ms']['p95'])}", file=sys.stderr)
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+def spawn(args) -> List[subprocess.Popen]:
+    """Start the mock provider and a router configured to call it (fresh database)."""
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    mock = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_provider", "--port", str(args.mock_port)])
+    wait_until_up(f"{mock_url}/mock/config")
+
+    db_dir = tempfile.mkdtemp(prefix="router-bench-")
+    env = dict(
+        os.environ,
+        GEMINI_API_BASE=mock_url,
+        OPENAI_API_BASE=mock_url,
+        GOOGLE_API_KEY=os.environ.get("GOOGLE_API_KEY", "mock-key"),
+        DATABASE_URL=f"sqlite:///{db_dir}/bench.db"
+    )
+    router = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.router_port), "--log-level", "warning"],
+        env=env
+    )
+    args.url = f"http://127.0.0.1:{args.router_port}"
+    try:
+        wait_until_up(f"{args.url}/stats")
+    except RuntimeError:
+        for process in (router, mock):
+            process.terminate()
+        raise
+    return [router, mock]
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Router load benchmark")
+    parser.add_argument("--url", default="http://localhost:8000", help="Router base URL")
+    parser.add_argument("--endpoints", default="route,batch,stats", type=lambda s: s.split(","),
+                        help="Comma-separated: route, batch, stats")
+    parser.add_argument("--concurrency", default="1,4,16,64", type=lambda s: [int(c) for c in s.split(",")],
+                        help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and level")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests before each level")
+    parser.add_argument("--batch-size", type=int, default=20, help="Items per /route/batch request")
+    parser.add_argument("--repeat-prompts", dest="unique_prompts", action="store_false",
+                        help="Reuse the same prompts (exercises the caches and coalescing)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--spawn", action="store_true", help="Start the mock provider and a router")
+    parser.add_argument("--mock-port", type=int, default=9100)
+    parser.add_argument("--router-port", type=int, default=8100)
+    parser.add_argument("--output", help="Write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    processes = spawn(args) if args.spawn else []
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Local stand-in for the Gemini and OpenAI APIs, for load tests without real keys or quotas.
+
+Serves the endpoints the router calls:
+  GET  /v1beta/models                              (model discovery)
+  POST /v1beta/models/{model}:generateContent
+  POST /v1beta/models/{model}:streamGenerateContent (alt=sse)
+  POST /v1/chat/completions
+
+Latency, error rate and 429 bursts come from MOCK_* environment variables and can
+be changed while running with POST /mock/config. Classification prompts get a
+valid JSON verdict, so the LLM/tiered classifiers work against it too.
+
+Run: python -m benchmarks.mock_provider --port 9100
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from collections import Counter
+from typing import Optional
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+class MockConfig(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="MOCK_")
+
+    LATENCY_MS: float = 200.0 # Median response latency
+    LATENCY_DISTRIBUTION: str = "lognormal" # "fixed", "uniform" or "lognormal"
+    LATENCY_SPREAD: float = 0.5 # Lognormal sigma, or +/- fraction of LATENCY_MS for uniform
+    ERROR_RATE: float = 0.0 # Fraction of calls answered with a 500
+    RATE_LIMIT_EVERY_SECONDS: float = 0.0 # Start a 429 burst this often (0 = never)
+    RATE_LIMIT_BURST_SECONDS: float = 1.0 # How long each 429 burst lasts
+    STREAM_CHUNKS: int = 8
+    MODEL: str = "gemini-2.5-flash"
+
+class MockConfigUpdate(BaseModel):
+    LATENCY_MS: Optional[float] = None
+    LATENCY_DISTRIBUTION: Optional[str] = None
+    LATENCY_SPREAD: Optional[float] = None
+    ERROR_RATE: Optional[float] = None
+    RATE_LIMIT_EVERY_SECONDS: Optional[float] = None
+    RATE_LIMIT_BURST_SECONDS: Optional[float] = None
+    STREAM_CHUNKS: Optional[int] = None
+
+config = MockConfig()
+calls = Counter()
+started_at = time.monotonic()
+
+app = FastAPI(title="Mock LLM Provider")
+
+def sample_latency() -> float:
+    """Seconds to wait before answering, drawn from the configured distribution."""
+    median = config.LATENCY_MS / 1000
+    if config.LATENCY_DISTRIBUTION == "fixed":
+        return median
+    if config.LATENCY_DISTRIBUTION == "uniform":
+        return max(random.uniform(median * (1 - config.LATENCY_SPREAD), median * (1 + config.LATENCY_SPREAD)), 0.0)
+    # Lognormal: median stays put, the tail grows with the spread
+    return median * random.lognormvariate(0, config.LATENCY_SPREAD)
+
+def failure(endpoint: str) -> Optional[JSONResponse]:
+    """A 429 during a rate-limit burst, a 500 at ERROR_RATE, else None."""
+    every = config.RATE_LIMIT_EVERY_SECONDS
+    if every > 0 and (time.monotonic() - started_at) % every < config.RATE_LIMIT_BURST_SECONDS:
+        calls[(endpoint, 429)] += 1
+        return JSONResponse({"error": {"code": 429, "message": "Resource exhausted (mock burst)"}}, status_code=429)
+    if random.random() < config.ERROR_RATE:
+        calls[(endpoint, 500)] += 1
+        return JSONResponse({"error": {"code": 500, "message": "Internal error (mock)"}}, status_code=500)
+    calls[(endpoint, 200)] += 1
+    return None
+
+def difficulty_of(prompt: str) -> str:
+    words = len(prompt.split())
+    if words < 12:
+        return "simple"
+    return "moderate" if words < 60 else "complex"
+
+def reply_to(text: str) -> str:
+    """Answer a routed prompt, or a JSON verdict for the router's classification prompts."""
+    if "classify its complexity for LLM routing" not in text:
+        return f"Mock answer to: {text[:40]}"
+    batch = re.search(r"User Prompts:\n(.*?)\n\nClassification Rules", text, re.S)
+    if batch:
+        prompts = [re.sub(r"^\d+\. ", "", line) for line in batch.group(1).splitlines()]
+        return json.dumps([{"difficulty": difficulty_of(p), "reasoning": "mock verdict"} for p in prompts])
+    single = re.search(r'User Prompt: "(.*)"\n\nClassification Rules', text, re.S)
+    return json.dumps({"difficulty": difficulty_of(single.group(1) if single else text), "reasoning": "mock verdict"})
+
+def gemini_text(body: dict) -> str:
+    return "".join(part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", []))
+
+@app.get("/v1beta/models")
+async def list_models():
+    calls[("models", 200)] += 1
+    return {"models": [
+        {"name": f"models/{config.MODEL}", "supportedGenerationMethods": ["generateContent"]},
+        {"name": "models/gemini-2.5-pro", "supportedGenerationMethods": ["generateContent"]}
+    ]}
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def generate_content(model: str, request: Request):
+    await asyncio.sleep(sample_latency())
+    error = failure("generateContent")
+    if error:
+        return error
+    text = reply_to(gemini_text(await request.json()))
+    return {
+        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}],
+        "usageMetadata": {"candidatesTokenCount": len(text.split())}
+    }
+
+@app.post("/v1beta/models/{model}:streamGenerateContent")
+async def stream_generate_content(model: str, request: Request):
+    latency = sample_latency()
+    # Time to first token is a share of the total, like a real stream
+    await asyncio.sleep(latency * 0.4)
+    error = failure("streamGenerateContent")
+    if error:
+        return error
+    words = reply_to(gemini_text(await request.json())).split(" ")
+    chunks = max(min(config.STREAM_CHUNKS, len(words)), 1)
+    size = -(-len(words) // chunks)
+
+    async def events():
+        for i in range(0, len(words), size):
+            if i:
+                await asyncio.sleep(latency * 0.6 / chunks)
+            event = {"candidates": [{"content": {"parts": [{"text": " ".join(words[i:i + size]) + " "}]}}]}
+            if i + size >= len(words):
+                event["usageMetadata"] = {"candidatesTokenCount": len(words)}
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    await asyncio.sleep(sample_latency())
+    error = failure("chat.completions")
+    if error:
+        return error
+    body = await request.json()
+    text = reply_to(" ".join(m.get("content", "") for m in body.get("messages", [])))
+    tokens = len(text.split())
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": tokens, "total_tokens": tokens}
+    }
+
+@app.get("/mock/config")
+async def get_config():
+    return config.model_dump()
+
+@app.post("/mock/config")
+async def update_config(update: MockConfigUpdate):
+    for key, value in update.model_dump(exclude_none=True).items():
+        setattr(config, key, value)
+    return config.model_dump()
+
+@app.get("/mock/stats")
+async def get_stats():
+    return {f"{endpoint} {status}": count for (endpoint, status), count in sorted(calls.items())}
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock Gemini/OpenAI provider for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    args = parser.parse_args()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -2,8 +2,7 @@ import streamlit as st
 import pandas as pd
 import requests
 import time
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from app.database import SessionLocal
 from app.models import RequestLog
 from app.config import settings
 
@@ -68,10 +67,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Setup DB connection
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
 # Sidebar - Settings
 with st.sidebar:
     st.image("https://img.icons8.com/fluency/96/artificial-intelligence.png", width=80)
@@ -62,6 +62,7 @@ def run_verification():
 
         # Test 4: Stats
         print("\nTest 4: Stats")
+        time.sleep(1) # Request logs are flushed in the background
         response = requests.get(f"{base_url}/stats")
         if response.status_code == 200:
             data = response.json()